@@ -1,93 +1,96 @@
 """
 00-scrape-place-id.py
 ----------------------------------
-Collect all Yelp place_id values for restaurants in Christchurch, New Zealand
-using SerpApi's Yelp search engine.
+Collect all Yelp place_id values for restaurants in a city (CITY env var,
+default Christchurch, New Zealand) using SerpApi's Yelp search engine.
+Search pages are prefetched concurrently (see pagination.py).
 """
 
 import os
 import json
 import csv 
-import time
 import requests
+import pandas as pd
+from pathlib import Path
+
+from cities import API_BUDGET, current_city, write_city_partition
+from pagination import paginate
+from snapshots import archive_snapshot
 
 # Set the SerpApi API key from environment variable
 API_KEY = os.getenv('SERPAPI_API_KEY')
 BASE_URL = "https://serpapi.com/search"
-CITY = "Christchurch, New Zealand"
+CITY_INFO = current_city()
+CITY = CITY_INFO.name
 TERM = "Restaurant"
 PAGES = 10
+PAGE_SIZE = 10
 DELAY = 1.0
 MAX_EMPTY = 2
+PREFETCH = 3      # speculative search pages in flight
+
+def fetch_search_page(start, city=CITY, term=TERM):
+    "Fetch one page of Yelp search results (organic_results)"
+    params = {
+        "api_key": API_KEY,
+        "engine": "yelp",
+        "find_desc": term,
+        "find_loc": city,
+        "start": start,  # Yelp pagination (10 results per page)
+    }
+    API_BUDGET.acquire()
+    resp = requests.get(BASE_URL, params=params, timeout= 20)
+    resp.raise_for_status()
+    return resp.json().get("organic_results", [])
 
 def fetch_place_ids(city=CITY, term=TERM, pages=PAGES):
-    "Fetch unique Yelp place_ids for a city"
+    "Fetch unique Yelp place_ids for a city; returns (place_data, whether all pages were read)"
     place_data = []
     seen_ids = set()
-    page = 0
-    empty_pages = 0
-
-    while True:
-        print(f"Fetching page {page+1} for {city} ...")
-
-        params = {
-            "api_key": API_KEY,
-            "engine": "yelp",
-            "find_desc": term,
-            "find_loc": city,
-            "start": page * 10,  # Yelp pagination (10 results per page)
-        }
-        try: 
-            resp = requests.get(BASE_URL, params=params, timeout= 20)
-            resp.raise_for_status()
-            data = resp.json()
-        except Exception as e:
-            print("Error fetching data:", e)
-            break
-
-        organic_results = data.get("organic_results", [])
-        if not organic_results:
-            empty_pages += 1
-            print(f"No results on page {page+1}. ({empty_pages}/{MAX_EMPTY})")
-            if empty_pages >= MAX_EMPTY:
-                print("No more pages — stopping scrape.")
-                break
-            else:
-                page += 1
-                continue 
-        
-        empty_pages = 0  # reset counter if we got valid results
-
-        for result in organic_results:
-            title = result.get("title")
-            link = result.get("link")
-            rating = result.get("rating")
-            reviews = result.get("reviews")
-            price = result.get("price")
-            categories = [c.get("title") for c in result.get("categories", [])]
-            place_ids = result.get("place_ids", [])
-
-            for pid in place_ids:
-                if pid not in seen_ids:
-                    seen_ids.add(pid)
-                    place_data.append({
-                        "place_id": pid,
-                        "title": title,
-                        "rating": rating,
-                        "reviews": reviews,
-                        "price": price,
-                        "categories": ", ".join(categories),
-                        "link": link,
-                    })
-        print(f"Collected {len(seen_ids)} unique place_ids so far.")
-        page += 1
-        time.sleep(DELAY)
-    return place_data
-
-def save_results(place_data, prefix = "Christchurch"):
-    "Write a function to saved the results to CSV and JSON files"
-    json_file = f"{prefix}_place_ids.json"
-    csv_file = f"{prefix}_place_ids.csv"
+    complete = True
+
+    # Next PREFETCH pages are requested while the current one is processed;
+    # MAX_EMPTY empty pages in a row end the scrape and cancel the rest.
+    search_pages = paginate(
+        lambda start: fetch_search_page(start, city, term),
+        step=PAGE_SIZE, max_empty=MAX_EMPTY, prefetch=PREFETCH, delay=DELAY,
+    )
+    try:
+        for start, organic_results in search_pages:
+            print(f"Fetched page {start // PAGE_SIZE + 1} for {city} ...")
+
+            for result in organic_results:
+                title = result.get("title")
+                link = result.get("link")
+                rating = result.get("rating")
+                reviews = result.get("reviews")
+                price = result.get("price")
+                categories = [c.get("title") for c in result.get("categories", [])]
+                place_ids = result.get("place_ids", [])
+
+                for pid in place_ids:
+                    if pid not in seen_ids:
+                        seen_ids.add(pid)
+                        place_data.append({
+                            "place_id": pid,
+                            "title": title,
+                            "rating": rating,
+                            "reviews": reviews,
+                            "price": price,
+                            "categories": ", ".join(categories),
+                            "link": link,
+                        })
+            print(f"Collected {len(seen_ids)} unique place_ids so far.")
+    except Exception as e:
+        print("Error fetching data:", e)
+        complete = False
+    else:
+        print("No more pages — stopping scrape.")
+    return place_data, complete
+
+def save_results(place_data, csv_file = CITY_INFO.yelp_place_ids_csv, json_file = CITY_INFO.yelp_place_ids_json, publish = True):
+    "Write a function to saved the results to CSV and JSON files (publish = snapshot + city partition)"
+    Path(csv_file).parent.mkdir(parents=True, exist_ok=True)
 
     with open(json_file, "w", encoding="utf-8") as jf:
         json.dump(place_data, jf, indent=2, ensure_ascii=False)
@@ -101,15 +104,33 @@ def save_results(place_data, prefix = "Christchurch"):
             writer.writerows(place_data)
         print(f"Saved {len(place_data)} records to {csv_file}")
 
+        if not publish:
+            return
+
+        # Keep a timestamped copy so 08-diff-discovery-snapshots.py can diff runs
+        snapshot = archive_snapshot(csv_file, "yelp", CITY_INFO)
+        print(f"Archived snapshot → {snapshot}")
+
+        partition = write_city_partition(pd.DataFrame(place_data), "yelp_places", CITY_INFO)
+        print(f"Saved city partition → {partition}")
+
 def main():
     if not API_KEY:
         print("Missing SERPAPI_API_KEY environment variable.")
         return
 
-    place_data = fetch_place_ids()
+    place_data, complete = fetch_place_ids()
     print(f"Total unique businesses collected: {len(place_data)}")
 
-    if place_data:
+    if not complete:
+        # A truncated run would look like closed places to 08: keep it aside, unpublished.
+        if place_data:
+            save_results(place_data,
+                         csv_file=CITY_INFO.yelp_place_ids_csv.replace(".csv", "-partial.csv"),
+                         json_file=CITY_INFO.yelp_place_ids_json.replace(".json", "-partial.json"),
+                         publish=False)
+        print("Scrape incomplete — discovery outputs, snapshot and partition not updated.")
+    elif place_data:
         save_results(place_data)
 
 if __name__ == "__main__":
@@ -2,42 +2,60 @@
 01-scrape-review-resume.py
 
 Resumable Yelp review scraper using SerpApi:
+- City is selected with the CITY env var (default christchurch)
 - Reads place_ids from INPUT_CSV
 - For each place_id it scrapes ALL reviews (recommended + not_recommended)
 - Saves per-place JSON files under "reviews/" and appends flattened rows to a master CSV
 - Maintains processed_ids.json to avoid re-scraping completed places on restart
+- If 08-diff-discovery-snapshots.py produced a re-scrape list, only those places
+  are scraped (in priority order) with a checkpoint scoped to that snapshot
+- Recommended and not_recommended reviews paginate concurrently, each
+  prefetching up to PREFETCH pages ahead (see pagination.py)
 - Uses retries + exponential backoff and tqdm progress bar
+- Writes the master CSV into the city-partitioned yelp_reviews Parquet dataset
 """
 
 import os
 import json
-import csv
 import time
 import requests
 import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 from tqdm import tqdm
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from cities import API_BUDGET, BudgetExhausted, current_city, write_city_partition
+from pagination import paginate
+from records import YelpReview, records_to_table
+from snapshots import load_rescrape_list
 
 # CONFIG
 API_KEY = os.getenv("SERPAPI_API_KEY")
 BASE_URL = "https://serpapi.com/search"
-INPUT_CSV = "data/yelp-data/christchurch-place-ids.csv"
-OUTPUT_DIR = Path("reviews")                 # per-place JSON will be saved here
-OUTPUT_CSV = "data/yelp-data/chc-reviews-data/christchurch-reviews-all-pages.csv"
-CHECKPOINT_FILE = Path("processed_ids.json")
-DELAY = 1.0              # polite pause between requests
+CITY = current_city()
+INPUT_CSV = CITY.yelp_place_ids_csv
+OUTPUT_DIR = Path("reviews") / CITY.slug     # per-place JSON will be saved here
+OUTPUT_CSV = f"data/yelp-data/{CITY.prefix}-reviews-data/{CITY.slug}-reviews-all-pages.csv"
+CHECKPOINT_FILE = Path(f"processed_ids_{CITY.slug}.json")
+DELAY = 1.0              # polite gap between request launches (per stream)
 MAX_PER_PAGE = 49
+NOT_RECOMMENDED_PER_PAGE = 10
+PREFETCH = 3             # speculative pages in flight per stream
 RETRY_LIMIT = 5
 INITIAL_BACKOFF = 1.0
 
 # Helper: ensure dirs
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+Path(OUTPUT_CSV).parent.mkdir(parents=True, exist_ok=True)
 
 # ----- HTTP helper with retries/backoff -----
 def safe_get(params, max_retries=RETRY_LIMIT):
     backoff = INITIAL_BACKOFF
     for attempt in range(1, max_retries + 1):
         try:
+            API_BUDGET.acquire()
             r = requests.get(BASE_URL, params=params, timeout=30)
             
             # 400 for 'not_recommended' means "no hidden reviews"
@@ -75,67 +93,68 @@ def fetch_reviews_page(place_id, start=0, not_recommended=False):
         params["start"] = start
     return safe_get(params)
 
-def fetch_all_reviews(place_id, delay=DELAY):
-    all_reviews = []
-
-    # Recommended reviews pagination
-    start = 0
-    while True:
-        data = fetch_reviews_page(place_id, start=start, not_recommended=False)
-        reviews = data.get("reviews", [])
-        if not reviews:
-            break
-        for r in reviews:
-            r["review_type"] = "recommended"
-        all_reviews.extend(reviews)
-        if len(reviews) < MAX_PER_PAGE:
-            break
-        start += MAX_PER_PAGE
-        time.sleep(delay)
-
-    # Not-recommended reviews pagination (use not_recommended_start; pages typically 10)
-    start = 0
-    data = fetch_reviews_page(place_id, start=start, not_recommended=True)
-    reviews = data.get("reviews", []) if data else []
-
-    # Only process if there are hidden reviews — otherwise silently skip
-    while reviews:
-        for r in reviews:
-            r["review_type"] = "not_recommended"
-        all_reviews.extend(reviews)
-        if len(reviews) < 10:
-            break
-        start += 10
-        time.sleep(delay)
-        data = fetch_reviews_page(place_id, start=start, not_recommended=True)
-        reviews = data.get("reviews", [])
-            
-    return all_reviews
+def _review_stream(place_id, not_recommended, delay=DELAY, prefetch=PREFETCH):
+    """All reviews of one stream, prefetching the next offsets while pages come in."""
+    page_size = NOT_RECOMMENDED_PER_PAGE if not_recommended else MAX_PER_PAGE
+    review_type = "not_recommended" if not_recommended else "recommended"
+
+    def fetch(start):
+        data = fetch_reviews_page(place_id, start=start, not_recommended=not_recommended)
+        return data.get("reviews", []) if data else []
+
+    reviews = []
+    for _, page in paginate(fetch, step=page_size, page_size=page_size, prefetch=prefetch, delay=delay):
+        for r in page:
+            r["review_type"] = review_type
+        reviews.extend(page)
+    return reviews
+
+def fetch_all_reviews(place_id, delay=DELAY, prefetch=PREFETCH):
+    # Recommended (start) and not-recommended (not_recommended_start; pages typically 10)
+    # are independent, so both streams paginate at the same time.
+    with ThreadPoolExecutor(max_workers=2) as streams:
+        recommended = streams.submit(_review_stream, place_id, False, delay, prefetch)
+        not_recommended = streams.submit(_review_stream, place_id, True, delay, prefetch)
+        return recommended.result() + not_recommended.result()
 
 # ----- Checkpoint helpers -----
-def load_processed_ids():
-    if CHECKPOINT_FILE.exists():
+def load_processed_ids(checkpoint_file=CHECKPOINT_FILE):
+    if checkpoint_file.exists():
         try:
-            return set(json.loads(CHECKPOINT_FILE.read_text(encoding="utf-8")))
+            return set(json.loads(checkpoint_file.read_text(encoding="utf-8")))
         except Exception:
             return set()
     return set()
 
-def save_processed_ids(processed):
-    CHECKPOINT_FILE.write_text(json.dumps(sorted(list(processed))), encoding="utf-8")
+def save_processed_ids(processed, checkpoint_file=CHECKPOINT_FILE):
+    checkpoint_file.write_text(json.dumps(sorted(list(processed))), encoding="utf-8")
 
 # ----- CSV append helpers (atomic-ish) -----
 def append_rows_to_csv(rows, csv_path=OUTPUT_CSV):
+    """Append YelpReview records via Arrow (column-wise, no per-row dicts)."""
     if not rows:
         return
     file_exists = Path(csv_path).exists()
-    keys = rows[0].keys()
+    table = records_to_table(rows, YelpReview)
     # write in append mode; create header if file absent
-    with open(csv_path, "a", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=keys)
-        if not file_exists:
-            writer.writeheader()
-        writer.writerows(rows)
+    with open(csv_path, "ab") as f:
+        pacsv.write_csv(table, f, write_options=pacsv.WriteOptions(include_header=not file_exists))
+
+def drop_place_rows(place_id, csv_path=OUTPUT_CSV):
+    """Remove a place's existing rows before it is re-scraped, so its reviews are not duplicated."""
+    if not Path(csv_path).exists():
+        return
+    table = pacsv.read_csv(
+        csv_path,
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(column_types=YelpReview.ARROW_SCHEMA),
+    )
+    keep = pc.invert(pc.fill_null(pc.equal(table["place_id"], place_id), False))
+    if pc.all(keep).as_py():
+        return
+    tmp_path = f"{csv_path}.tmp"
+    pacsv.write_csv(table.filter(keep), tmp_path)
+    os.replace(tmp_path, csv_path)
 
 # ----- Main -----
 def main():
@@ -153,8 +172,17 @@ def main():
         print("No place_id found in input CSV.")
         return
 
-    processed = load_processed_ids()
-    tqdm.write(f"{total_places} restaurants found in CSV, {len(processed)} already processed (from checkpoint).")
+    # Selective re-scrape: only places that gained reviews since the last discovery run
+    checkpoint_file = CHECKPOINT_FILE
+    rescrape = load_rescrape_list("yelp", CITY)
+    if rescrape is not None:
+        place_ids, snapshot = rescrape
+        total_places = len(place_ids)
+        checkpoint_file = Path(f"processed_ids_{CITY.slug}_{snapshot}.json")
+        tqdm.write(f"Using re-scrape list for snapshot {snapshot}.")
+
+    processed = load_processed_ids(checkpoint_file)
+    tqdm.write(f"{total_places} restaurants to scrape, {len(processed)} already processed (from checkpoint).")
 
     # progress bar over only the remaining
     remaining_ids = [pid for pid in place_ids if pid not in processed]
@@ -167,6 +195,9 @@ def main():
         try:
             # fetch all reviews (paginated)
             reviews = fetch_all_reviews(pid)
+        except BudgetExhausted as e:
+            tqdm.write(f"{e} — stopping; remaining places resume from checkpoint.")
+            break
         except Exception as e:
             tqdm.write(f"⚠️ Failed to fetch {pid}: {e}. Skipping and continuing.")
             # do not mark as processed; will retry on next run
@@ -181,31 +212,18 @@ def main():
             tqdm.write(f"Could not write JSON for {pid}: {e}")
 
         # flatten and append to master CSV immediately (so work is persisted)
-        flat_rows = []
-        for r in reviews:
-            flat_rows.append({
-                "place_id": pid,
-                "review_type": r.get("review_type"),
-                "user": r.get("user", {}).get("name"),
-                "rating": r.get("rating"),
-                "date": r.get("date"),
-                "text": r.get("comment", {}).get("text", ""),
-                "review_position": r.get("position"),
-                "user_address": r.get("user", {}).get("address"),
-                "useful": r.get("feedback", {}).get("useful"),
-                "cool": r.get("feedback", {}).get("cool"),
-                "funny": r.get("feedback", {}).get("funny"),
-                "user_link": r.get("user", {}).get("link"),
-            })
+        flat_rows = [YelpReview.from_serpapi(pid, r) for r in reviews]
 
         try:
+            if rescrape is not None:
+                drop_place_rows(pid, OUTPUT_CSV)
             append_rows_to_csv(flat_rows, OUTPUT_CSV)
         except Exception as e:
             tqdm.write(f"Could not append CSV for {pid}: {e}")
 
         # mark processed and persist checkpoint immediately
         processed.add(pid)
-        save_processed_ids(processed)
+        save_processed_ids(processed, checkpoint_file)
 
         # small polite pause
         time.sleep(DELAY)
@@ -214,5 +232,10 @@ def main():
     tqdm.write(f"Per-place JSON saved to: {OUTPUT_DIR.resolve()}")
     tqdm.write(f"Master CSV saved to: {Path(OUTPUT_CSV).resolve()}")
 
+    if Path(OUTPUT_CSV).exists():
+        partition = write_city_partition(pd.read_csv(OUTPUT_CSV), "yelp_reviews", CITY,
+                                         schema=YelpReview.ARROW_SCHEMA)
+        tqdm.write(f"City partition saved to: {partition.resolve()}")
+
 if __name__ == "__main__":
     main()
@@ -3,9 +3,14 @@ import time
 import requests
 import json
 import pandas as pd
-from typing import Dict, List, Optional
+import pyarrow.parquet as pq
+from typing import Dict, List, Tuple
 from tqdm import tqdm
 
+from cities import API_BUDGET, BudgetExhausted, current_city, write_city_partition
+from records import GooglePlace, records_from_table, records_to_table
+from snapshots import archive_snapshot
+
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
 if not SERPAPI_API_KEY:
     raise RuntimeError("Please set SERPAPI_API_KEY in your environment.")
@@ -13,40 +18,23 @@ if not SERPAPI_API_KEY:
 SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
 
 # ---- Tunables ----
-CITY_TEXT = "Christchurch, New Zealand"
-DISCOVERY_QUERIES = [
-    f"restaurants in {CITY_TEXT}",
-    f"bars in {CITY_TEXT}",
-    f"food in {CITY_TEXT}",
-    f"vietnamese restaurant in {CITY_TEXT}",
-    f"chinese restaurant in {CITY_TEXT}",
-    f"thai restaurant in {CITY_TEXT}",
-    f"japanese restaurant in {CITY_TEXT}",
-    f"indian restaurant in {CITY_TEXT}",
-]
+CITY = current_city()    # CITY env var, default christchurch
+CITY_TEXT = CITY.name
+DISCOVERY_QUERIES = CITY.discovery_queries
 
 HL = "en"
 RESULTS_PER_PAGE = 20    # Per SerpAPI docs: max 20 for Google Maps search
 MAX_START = 100          # Recommended by SerpAPI (pages: 0,20,40,60,80,100)
 PAGE_SLEEP_S = 2.0
 
-OUT_DIR = "data/google-data/google-restaurants-place/raw"
+OUT_DIR = CITY.google_places_dir
 os.makedirs(OUT_DIR, exist_ok=True)
 
-OUTPUT_PARQUET = f"{OUT_DIR}/chc_google_places.parquet"
-OUTPUT_CSV = f"{OUT_DIR}/chc_google_places.csv"
-OUTPUT_JSONL = f"{OUT_DIR}/chc_google_places.jsonl"
-
-CHECKPOINT_PATH = f"{OUT_DIR}/checkpoint_places.parquet"
-
+OUTPUT_PARQUET = CITY.google_places_parquet
+OUTPUT_CSV = CITY.google_places_csv
+OUTPUT_JSONL = CITY.google_places_jsonl
 
-def _safe_int(n) -> Optional[int]:
-    if n is None:
-        return None
-    try:
-        return int(str(n).replace(",", ""))
-    except:
-        return None
+CHECKPOINT_PATH = f"{OUT_DIR}/{CITY.prefix}_checkpoint_places.parquet"
 
 
 def _extract_items(resp_json: Dict) -> List[Dict]:
@@ -56,32 +44,7 @@ def _extract_items(resp_json: Dict) -> List[Dict]:
     return []
 
 
-def _extract_normalized_row(item: Dict, query: str, start: int, search_id: Optional[str]) -> Dict:
-    gps = item.get("gps_coordinates", {}) or {}
-    itype = item.get("type") or item.get("category")
-    if isinstance(itype, list):
-        itype = ", ".join(itype)
-
-    reviews_count = _safe_int(item.get("reviews_count", item.get("reviews")))
-
-    return {
-        "place_id": item.get("place_id"),
-        "data_id": item.get("data_id"),
-        "title": item.get("title"),
-        "address": item.get("address"),
-        "lat": gps.get("latitude"),
-        "lon": gps.get("longitude"),
-        "type": itype,
-        "rating": item.get("rating"),
-        "reviews_count": reviews_count,
-        "url": item.get("link") or item.get("place_link"),
-        "search_query": query,
-        "start_offset": start,
-        "serpapi_search_id": search_id,
-    }
-
-
-def serpapi_google_maps_search(query: str) -> List[Dict]:
+def serpapi_google_maps_search(query: str) -> List[GooglePlace]:
     """
     Uses correct SerpAPI pagination for engine=google_maps.
     Requires location + z parameter for pagination.
@@ -101,6 +64,7 @@ def serpapi_google_maps_search(query: str) -> List[Dict]:
             "num": RESULTS_PER_PAGE,
         }
 
+        API_BUDGET.acquire()
         r = requests.get(SERPAPI_ENDPOINT, params=params, timeout=60)
         if r.status_code != 200:
             raise RuntimeError(f"SerpAPI error {r.status_code}: {r.text[:200]}")
@@ -113,23 +77,25 @@ def serpapi_google_maps_search(query: str) -> List[Dict]:
             break
 
         for item in items:
-            all_rows.append(_extract_normalized_row(item, query, start, search_id))
+            all_rows.append(GooglePlace.from_serpapi(item, query, start, search_id))
 
         start += RESULTS_PER_PAGE
         time.sleep(PAGE_SLEEP_S)
 
     return all_rows
 
-def discover_christchurch_places() -> pd.DataFrame:
+def discover_places() -> Tuple[pd.DataFrame, bool]:
+    """Return (deduplicated places, whether every query finished)."""
     all_records = []
+    complete = True
 
     # Load checkpoint if exists
     already_scraped = set()
     if os.path.exists(CHECKPOINT_PATH):
         print(f"Resuming from checkpoint: {CHECKPOINT_PATH}")
-        df_checkpoint = pd.read_parquet(CHECKPOINT_PATH)
-        already_scraped = set(df_checkpoint["search_query"].unique())
-        all_records.extend(df_checkpoint.to_dict(orient="records"))
+        checkpoint = records_from_table(pq.read_table(CHECKPOINT_PATH), GooglePlace)
+        already_scraped = {rec.search_query for rec in checkpoint}
+        all_records.extend(checkpoint)
 
     print(f"Already scraped: {len(already_scraped)} queries")
     print(f"Queries to scrape: {len(DISCOVERY_QUERIES)}")
@@ -139,20 +105,24 @@ def discover_christchurch_places() -> pd.DataFrame:
             tqdm.write(f"Skipping already scraped query: {q}")
             continue
 
-        rows = serpapi_google_maps_search(q)
+        try:
+            rows = serpapi_google_maps_search(q)
+        except BudgetExhausted as e:
+            tqdm.write(f"{e} — stopping; remaining queries resume from checkpoint.")
+            complete = False
+            break
         tqdm.write(f"Retrieved {len(rows)} rows")
 
         all_records.extend(rows)
 
         # Save checkpoint
-        df_temp = pd.DataFrame(all_records)
-        df_temp.to_parquet(CHECKPOINT_PATH, index=False)
+        pq.write_table(records_to_table(all_records, GooglePlace), CHECKPOINT_PATH)
         tqdm.write("Checkpoint updated.")
 
-    df = pd.DataFrame(all_records)
+    df = records_to_table(all_records, GooglePlace).to_pandas()
     if df.empty:
         print("No data discovered.")
-        return df
+        return df, complete
 
     # Deduplicate by place_id OR data_id
     df["unique_key"] = df["place_id"].fillna(df["data_id"])
@@ -160,7 +130,7 @@ def discover_christchurch_places() -> pd.DataFrame:
     df = df.sort_values("reviews_count", ascending=False)
     df = df.drop_duplicates(subset=["unique_key"], keep="first")
 
-    return df
+    return df, complete
 
 
 def save_outputs(df: pd.DataFrame):
@@ -171,13 +141,27 @@ def save_outputs(df: pd.DataFrame):
         for rec in df.to_dict(orient="records"):
             f.write(json.dumps(rec, ensure_ascii=False) + "\n")
 
+    # Keep a timestamped copy so 08-diff-discovery-snapshots.py can diff runs
+    snapshot = archive_snapshot(OUTPUT_PARQUET, "google", CITY)
+    print(f"Archived snapshot → {snapshot}")
+
+    partition = write_city_partition(df, "google_places", CITY, schema=GooglePlace.ARROW_SCHEMA)
+    print(f"Saved city partition → {partition}")
+
 
 if __name__ == "__main__":
-    df_places = discover_christchurch_places()
+    df_places, complete = discover_places()
 
-    if not df_places.empty:
+    if not complete:
+        # A partial run would look like closed places to 08; only the checkpoint is kept.
+        print(f"Discovery incomplete ({len(df_places)} places so far) — outputs, snapshot "
+              f"and partition not written. Rerun to resume from {CHECKPOINT_PATH}.")
+    elif not df_places.empty:
         print(f"Total unique places discovered: {len(df_places)}")
         save_outputs(df_places)
+        # The run is complete: the next discovery run must query everything again.
+        if os.path.exists(CHECKPOINT_PATH):
+            os.remove(CHECKPOINT_PATH)
         print("Finished! All outputs saved.")
     else:
         print("Nothing to save.")
\ No newline at end of file
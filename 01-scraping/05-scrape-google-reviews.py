@@ -1,10 +1,13 @@
 """
-Scrape newest Google Maps reviews for all restaurants in Christchurch.
+Scrape newest Google Maps reviews for all restaurants in a city
+(CITY env var, default Christchurch).
 - Uses engine=google_maps_reviews
 - Fetches first page (~10 newest reviews) ONLY
 - Auto-checkpointing (resume-safe)
 - Error handling, retry, rate limit
-- Saves CSV, Parquet, JSONL
+- Saves CSV, Parquet, JSONL + the city-partitioned google_reviews dataset
+- If 08-diff-discovery-snapshots.py produced a re-scrape list, only those places
+  are scraped (in priority order) with a checkpoint scoped to that snapshot
 """
 
 import os
@@ -14,6 +17,9 @@ import requests
 import pandas as pd
 from tqdm import tqdm
 
+from cities import API_BUDGET, BudgetExhausted, current_city, write_city_partition
+from snapshots import load_rescrape_list
+
 # Configuration
 SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
 if not SERPAPI_API_KEY:
@@ -21,15 +27,16 @@ if not SERPAPI_API_KEY:
 
 SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
 
-INPUT_RESTAURANTS = "data/google-data/chc_google_places_v1.csv"
+CITY = current_city()
+INPUT_RESTAURANTS = CITY.google_places_csv
 
 OUT_DIR = "data/google-data/google-reviews/raw"
 os.makedirs(OUT_DIR, exist_ok=True)
 
-CHECKPOINT_PATH = f"{OUT_DIR}/checkpoint_reviews.csv"
-OUTPUT_JSONL = f"{OUT_DIR}/chc_reviews.jsonl"
-OUTPUT_CSV = f"{OUT_DIR}/chc_reviews.csv"
-OUTPUT_PARQUET = f"{OUT_DIR}/chc_reviews.parquet"
+CHECKPOINT_PATH = f"{OUT_DIR}/{CITY.prefix}_checkpoint_reviews.csv"
+OUTPUT_JSONL = f"{OUT_DIR}/{CITY.prefix}_reviews.jsonl"
+OUTPUT_CSV = f"{OUT_DIR}/{CITY.prefix}_reviews.csv"
+OUTPUT_PARQUET = f"{OUT_DIR}/{CITY.prefix}_reviews.parquet"
 
 RATE_LIMIT_SECONDS = 1.5      # to avoid 1000 req/hr throttling
 RETRY_LIMIT = 3               # retry on failures
@@ -49,6 +56,7 @@ def scrape_google_reviews_page(place_id, next_page_token=None):
     if next_page_token:
         params["next_page_token"] = next_page_token
 
+    API_BUDGET.acquire()
     r = requests.get(SERPAPI_ENDPOINT, params=params, timeout=60)
 
     if r.status_code != 200:
@@ -66,6 +74,8 @@ def scrape_reviews_for_place(place_id):
         try:
             data = scrape_google_reviews_page(place_id, None)
             break
+        except BudgetExhausted:
+            raise
         except Exception as e:
             print(f"[ERROR] {place_id}: {e}. Retry ({attempt+1}/{RETRY_LIMIT})")
             time.sleep(3)
@@ -91,6 +101,13 @@ def scrape_reviews_for_place(place_id):
 restaurants = pd.read_csv(INPUT_RESTAURANTS)
 place_ids = restaurants["place_id"].dropna().unique().tolist()
 
+# Selective re-scrape: only places that gained reviews since the last discovery run
+rescrape = load_rescrape_list("google", CITY)
+if rescrape is not None:
+    place_ids, snapshot = rescrape
+    CHECKPOINT_PATH = f"{OUT_DIR}/{CITY.prefix}_checkpoint_reviews_{snapshot}.csv"
+    print(f"Using re-scrape list for snapshot {snapshot}.")
+
 if os.path.exists(CHECKPOINT_PATH):
     scraped_df = pd.read_csv(CHECKPOINT_PATH)
     already_done = set(scraped_df["place_id"])
@@ -110,7 +127,11 @@ for place_id in tqdm(place_ids, desc="Scraping restaurants"):
     if place_id in already_done:
         continue
 
-    reviews = scrape_reviews_for_place(place_id)
+    try:
+        reviews = scrape_reviews_for_place(place_id)
+    except BudgetExhausted as e:
+        print(f"{e} — stopping; remaining places resume from checkpoint.")
+        break
     all_reviews.extend(reviews)
 
     # checkpoint
@@ -125,18 +146,37 @@ for place_id in tqdm(place_ids, desc="Scraping restaurants"):
 
 
 # Save outputs
-df = pd.json_normalize(all_reviews)
+# Merge into the existing outputs: places scraped this run replace their old
+# rows, every other place is kept (re-scrape and resumed runs only cover a subset).
+df_new = pd.json_normalize(all_reviews)
+refreshed = set(df_new["place_id"]) if "place_id" in df_new else set()
+
+if os.path.exists(OUTPUT_PARQUET):
+    df_old = pd.read_parquet(OUTPUT_PARQUET)
+    df_old = df_old[~df_old["place_id"].isin(refreshed)]
+else:
+    df_old = pd.DataFrame()
+df = pd.concat([df_old, df_new.astype(str)], ignore_index=True)
 df = df.astype(str)  # prevent Parquet dtype errors
 
 df.to_csv(OUTPUT_CSV, index=False)
 df.to_parquet(OUTPUT_PARQUET, index=False)
 
+kept_rows = []
+if os.path.exists(OUTPUT_JSONL):
+    with open(OUTPUT_JSONL, encoding="utf-8") as f:
+        kept_rows = [line for line in f if json.loads(line).get("place_id") not in refreshed]
 with open(OUTPUT_JSONL, "w", encoding="utf-8") as f:
+    f.writelines(kept_rows)
     for row in all_reviews:
         f.write(json.dumps(row, ensure_ascii=False) + "\n")
 
+partition = write_city_partition(df, "google_reviews", CITY)
+
 print("\nScraping finished!")
+print(f"Reviews scraped this run: {len(df_new)} ({len(refreshed)} places)")
 print(f"Total reviews saved: {len(df)}")
 print(f"CSV → {OUTPUT_CSV}")
 print(f"Parquet → {OUTPUT_PARQUET}")
 print(f"JSONL → {OUTPUT_JSONL}")
+print(f"City partition → {partition}")
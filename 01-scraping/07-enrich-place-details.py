@@ -0,0 +1,269 @@
+"""
+07-enrich-place-details.py
+----------------------------------
+Enrich the restaurant features dataset with Google Maps place details
+(phone, website, opening hours, service options, price level).
+
+- Picks Google places by reviews_count threshold and a USD budget
+- Skips places whose details were scraped less than FRESH_DAYS ago (resume-safe)
+- Fetches place details concurrently with retry + exponential backoff
+- Writes typed columns straight into the enriched-features Parquet
+  (and its city partition) for the city selected by the CITY env var
+"""
+
+import os
+import time
+import requests
+import pandas as pd
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+from tqdm import tqdm
+
+from cities import API_BUDGET, ApiBudget, current_city, match_place_ids, write_city_partition
+
+SERPAPI_API_KEY = os.getenv("SERPAPI_API_KEY")
+if not SERPAPI_API_KEY:
+    raise RuntimeError("Please set SERPAPI_API_KEY in your environment.")
+
+SERPAPI_ENDPOINT = "https://serpapi.com/search.json"
+
+# ---- Tunables ----
+CITY = current_city()
+INPUT_PLACES = CITY.google_places_csv
+FEATURES_PARQUET = CITY.features_parquet
+
+BUDGET_USD = 7.00          # hard cap on spend for one run
+COST_PER_CALL_USD = 0.01   # SerpAPI cost of one place-details request
+# Whole calls the budget buys (round, not //: 7.0 // 0.01 == 699.0).
+MAX_CALLS = round(BUDGET_USD / COST_PER_CALL_USD)
+MIN_REVIEWS = 10           # skip places with fewer Google reviews than this
+FRESH_DAYS = 30            # details newer than this are not re-fetched
+MAX_WORKERS = 8            # concurrent SerpAPI requests
+CHECKPOINT_EVERY = 25      # write the Parquet after this many fetched places
+RETRY_LIMIT = 3
+INITIAL_BACKOFF = 2.0
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+PRICE_BUCKETS = {0: "Unknown", 1: "Budget", 2: "Mid-range", 3: "Upscale", 4: "Upscale"}
+
+# Spend cap for this run; retries past it fail the place instead of overspending.
+RUN_BUDGET = ApiBudget(max_calls=MAX_CALLS)
+
+
+def get_place_details(place_id: str) -> Dict:
+    """
+    Fetch the place_results payload for one place, retrying on 429/5xx.
+    Every attempt, retries included, is charged to RUN_BUDGET, so the USD cap holds.
+    """
+    params = {
+        "engine": "google_maps",
+        "type": "place",
+        "place_id": place_id,
+        "api_key": SERPAPI_API_KEY,
+        "hl": "en",
+    }
+
+    for attempt in range(1, RETRY_LIMIT + 1):
+        RUN_BUDGET.acquire()
+        API_BUDGET.acquire()
+        r = requests.get(SERPAPI_ENDPOINT, params=params, timeout=60)
+        if r.status_code == 200:
+            return r.json().get("place_results", {}) or {}
+        if r.status_code != 429 and r.status_code < 500:
+            break
+        if attempt < RETRY_LIMIT:
+            time.sleep(INITIAL_BACKOFF * (2 ** (attempt - 1)))
+
+    raise RuntimeError(f"SerpAPI error {r.status_code}: {r.text[:200]}")
+
+
+def _parse_hours(place_data: Dict) -> Dict[str, str]:
+    """Normalise the three hours formats SerpAPI returns into {weekday: hours}."""
+    hours = place_data.get("operating_hours")
+    if isinstance(hours, dict):
+        return {k.lower(): v for k, v in hours.items()}
+
+    hours = place_data.get("hours")
+    if isinstance(hours, dict):
+        return {k.lower(): v for k, v in hours.items()}
+
+    merged = {}
+    if isinstance(hours, list):
+        for day_dict in hours:
+            if isinstance(day_dict, dict):
+                merged.update({k.lower(): v for k, v in day_dict.items()})
+    return merged
+
+
+def _pretty_hours(hours: Dict[str, str]) -> Optional[str]:
+    if not hours:
+        return None
+    values = [hours.get(day) for day in WEEKDAYS]
+    if all(values) and len(set(values)) == 1:
+        return f"Daily: {values[0]}"
+    return ", ".join(f"{day[:3].title()}: {hours[day]}" for day in WEEKDAYS if hours.get(day))
+
+
+def _price_level_numeric(price: Optional[str]) -> Optional[float]:
+    """'$$' -> 2.0; ranges such as '$20-30' carry no level and map to 0.0."""
+    if not price:
+        return None
+    price = str(price).strip()
+    if set(price) == {"$"}:
+        return float(len(price))
+    return 0.0
+
+
+def extract_enhanced_features(place_data: Dict) -> Dict:
+    """Map a place_results payload onto the enriched-features columns."""
+    service_opts = place_data.get("service_options", {}) or {}
+    hours = _parse_hours(place_data)
+    price_numeric = _price_level_numeric(place_data.get("price"))
+
+    def _flag(*keys) -> Optional[bool]:
+        values = [service_opts.get(k) for k in keys if k in service_opts]
+        return any(bool(v) for v in values) if values else None
+
+    return {
+        "phone": place_data.get("phone"),
+        "website": place_data.get("website"),
+        "description": place_data.get("description"),
+        "open_state": place_data.get("open_state"),
+        "hours_dict": {day: hours.get(day) for day in WEEKDAYS} if hours else None,
+        "hours_pretty": _pretty_hours(hours),
+        "has_delivery": _flag("delivery", "no_contact_delivery"),
+        "has_takeout": _flag("takeout"),
+        "has_dine_in": _flag("dine_in"),
+        "price_level_numeric": price_numeric,
+        "price_bucket": PRICE_BUCKETS.get(int(price_numeric)) if price_numeric is not None else None,
+        "details_scraped_at": pd.Timestamp.now(),
+    }
+
+
+# Nullable dtypes so partially-enriched columns survive the Parquet round trip.
+DETAIL_DTYPES = {
+    "phone": "string",
+    "website": "string",
+    "description": "string",
+    "open_state": "string",
+    "hours_pretty": "string",
+    "has_delivery": "boolean",
+    "has_takeout": "boolean",
+    "has_dine_in": "boolean",
+    "price_level_numeric": "Float64",
+    "price_bucket": "string",
+    "hours_category": "string",
+    "details_scraped_at": "datetime64[ns]",
+}
+
+
+def select_places(df_features: pd.DataFrame, df_places: pd.DataFrame) -> pd.DataFrame:
+    """Choose which restaurants to enrich under the budget, busiest first."""
+    reviews_count = df_places.set_index("place_id")["reviews_count"]
+
+    candidates = df_features[["restaurant_id", "place_id", "details_scraped_at"]].copy()
+    candidates["reviews_count"] = candidates["place_id"].map(reviews_count)
+    candidates = candidates.dropna(subset=["place_id"])
+    candidates = candidates[candidates["reviews_count"] >= MIN_REVIEWS]
+
+    cutoff = pd.Timestamp.now() - timedelta(days=FRESH_DAYS)
+    stale = candidates["details_scraped_at"].isna() | (candidates["details_scraped_at"] < cutoff)
+    candidates = candidates[stale]
+
+    return candidates.sort_values("reviews_count", ascending=False).head(MAX_CALLS)
+
+
+def _apply_details(df_features: pd.DataFrame, results: Dict[str, Dict]) -> None:
+    """Write fetched details into df_features in place (index = restaurant_id)."""
+    for rid, features in results.items():
+        # hours_category is derived from the hours downstream; clear it when the
+        # hours change so it never contradicts them (recomputed on the next feature build).
+        if features["hours_dict"] != df_features.at[rid, "hours_dict"]:
+            df_features.loc[rid, "hours_category"] = pd.NA
+        for col, value in features.items():
+            if col == "hours_dict":
+                df_features.at[rid, col] = value
+            else:
+                df_features.loc[rid, col] = value
+
+
+def save_features(df_features: pd.DataFrame, columns: List[str], path: str = FEATURES_PARQUET) -> None:
+    """Write the Parquet via a temp file so an interrupted run never truncates it."""
+    tmp_path = f"{path}.tmp"
+    df_features.reset_index()[columns].to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def enrich_place_details() -> pd.DataFrame:
+    df_features = pd.read_parquet(FEATURES_PARQUET)
+    df_places = pd.read_csv(INPUT_PLACES).dropna(subset=["place_id"])
+    df_places = df_places.drop_duplicates(subset=["place_id"])
+
+    for col, dtype in DETAIL_DTYPES.items():
+        if col not in df_features.columns:
+            df_features[col] = pd.Series(pd.NA, index=df_features.index)
+        df_features[col] = df_features[col].astype(dtype)
+    if "hours_dict" not in df_features.columns:
+        df_features["hours_dict"] = None
+    df_features["hours_dict"] = df_features["hours_dict"].astype(object)
+    columns = df_features.columns.tolist()
+
+    df_features["place_id"] = match_place_ids(df_features["restaurant_id"], df_places["place_id"].tolist())
+    selected = select_places(df_features, df_places)
+    df_features = df_features.set_index("restaurant_id")
+
+    print(f"Restaurants in features dataset: {len(df_features)}")
+    print(f"Matched to Google place_id: {df_features['place_id'].notna().sum()}")
+    print(f"Selected for enrichment: {len(selected)} "
+          f"(>= {MIN_REVIEWS} reviews, older than {FRESH_DAYS} days)")
+    print(f"Estimated cost: ${len(selected) * COST_PER_CALL_USD:.2f} (budget ${BUDGET_USD:.2f})")
+
+    if selected.empty:
+        print("Nothing to do — all selected places are fresh.")
+        return df_features.reset_index()[columns]
+
+    pending: Dict[str, Dict] = {}
+    errors = []
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {
+            pool.submit(get_place_details, row.place_id): row.restaurant_id
+            for row in selected.itertuples(index=False)
+        }
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Fetching place details"):
+            rid = futures[fut]
+            try:
+                place_data = fut.result()
+            except Exception as e:
+                tqdm.write(f"[ERROR] {rid}: {e}")
+                errors.append({"restaurant_id": rid, "error": str(e)})
+                continue
+
+            if not place_data:
+                errors.append({"restaurant_id": rid, "error": "No place_results"})
+                continue
+
+            pending[rid] = extract_enhanced_features(place_data)
+
+            if len(pending) >= CHECKPOINT_EVERY:
+                _apply_details(df_features, pending)
+                save_features(df_features, columns)
+                pending.clear()
+                tqdm.write("Checkpoint updated.")
+
+    _apply_details(df_features, pending)
+    save_features(df_features, columns)
+    write_city_partition(df_features.reset_index()[columns], "restaurants_features", CITY)
+
+    print(f"Enriched: {len(selected) - len(errors)} restaurants")
+    print(f"Errors: {len(errors)}")
+    for err in errors:
+        print(f"   - {err['restaurant_id']}: {err['error']}")
+
+    return df_features.reset_index()[columns]
+
+
+if __name__ == "__main__":
+    enrich_place_details()
+    print(f"Finished! Features saved to {FEATURES_PARQUET}")
@@ -0,0 +1,61 @@
+"""
+08-diff-discovery-snapshots.py
+----------------------------------
+Change-data-capture between the two most recent discovery snapshots
+(written by 00-scrape-yelp-restaurants.py / 04-scrape-google-restaurants.py)
+for the city selected by the CITY env var.
+
+For each source it writes:
+- data/rescrape/<city>/<source>_snapshot_diff.csv   every new / closed / changed place
+- data/rescrape/<city>/<source>_rescrape_list.csv   prioritised place_ids to re-scrape
+
+02-scrape-yelp-reviews.py and 05-scrape-google-reviews.py pick the list up
+automatically and only scrape the places on it, until a newer discovery
+snapshot is archived (then they do a full scrape again).
+"""
+
+from cities import City, current_city
+from snapshots import (
+    SNAPSHOT_DIRS,
+    build_rescrape_list,
+    diff_snapshots,
+    latest_snapshots,
+    load_snapshot,
+    rescrape_paths,
+    snapshot_dir,
+)
+
+
+def diff_source(source: str, city: City) -> None:
+    source_dir = snapshot_dir(source, city)
+    snaps = latest_snapshots(source_dir)
+    if len(snaps) < 2:
+        print(f"[{city.slug}/{source}] Need two snapshots in {source_dir}, found {len(snaps)} — skipping.")
+        return
+
+    prev_path, curr_path = snaps
+    print(f"[{city.slug}/{source}] {prev_path.name} → {curr_path.name}")
+
+    diff = diff_snapshots(load_snapshot(prev_path, source), load_snapshot(curr_path, source))
+    rescrape = build_rescrape_list(diff, snapshot=curr_path.stem)
+
+    diff_path, list_path = rescrape_paths(source, city)
+    list_path.parent.mkdir(parents=True, exist_ok=True)
+    diff[diff["change_type"] != "unchanged"].to_csv(diff_path, index=False)
+    rescrape.to_csv(list_path, index=False)
+
+    counts = diff["change_type"].value_counts()
+    for change_type in ["new", "closed", "changed", "unchanged"]:
+        print(f"   {change_type:<10}: {counts.get(change_type, 0)}")
+    print(f"   Re-scrape list: {len(rescrape)} places, "
+          f"~{int(rescrape['reviews_to_fetch'].fillna(0).sum())} reviews → {list_path}")
+
+
+def main():
+    city = current_city()
+    for source in SNAPSHOT_DIRS:
+        diff_source(source, city)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+09-tag-cuisines.py
+----------------------------------
+Reproducible cuisine tagging for the merged restaurant dataset (stage 02 → 03).
+
+- All cuisine keywords compile into ONE trie-shaped regex, so each text is
+  scanned once and adding keywords does not add a pass per keyword
+- Matches in the restaurant title, Google place types and review text cast
+  weighted votes per cuisine; cuisines above MIN_SCORE are kept (top MAX_CUISINES)
+- Restaurants are tagged in chunks across a process pool
+- Saves JSON + Parquet in the same layout as data/03-chc-restaurant-enriched-cuisine
+  (as <prefix>_restaurants_cuisine_tagged.*, leaving the existing dataset untouched),
+  plus the city-partitioned restaurants_cuisine dataset (CITY env var)
+"""
+
+import os
+import re
+import json
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from tqdm import tqdm
+
+from cities import current_city, match_place_ids, write_city_partition
+
+# ---- Tunables ----
+CITY = current_city()
+INPUT_MERGED = CITY.merged_parquet
+INPUT_PLACES = CITY.google_places_csv
+
+OUT_DIR = CITY.cuisine_dir
+# Written next to, not over, the existing <prefix>_restaurants_enriched.* stage-03 dataset.
+OUTPUT_PARQUET = f"{OUT_DIR}/{CITY.prefix}_restaurants_cuisine_tagged.parquet"
+OUTPUT_JSON = f"{OUT_DIR}/{CITY.prefix}_restaurants_cuisine_tagged.json"
+
+FIELD_WEIGHTS = {"title": 3.0, "types": 3.0, "review": 1.0}
+MIN_SCORE = 2.0          # e.g. one title/type hit, or two separate reviews
+MAX_CUISINES = 5
+MAX_WORKERS = os.cpu_count() or 4
+CHUNK_SIZE = 64          # restaurants per worker task
+
+# cuisine -> keywords (lowercase; matched on word boundaries, plural 's' optional)
+CUISINE_KEYWORDS: Dict[str, List[str]] = {
+    "Chinese": ["chinese", "china", "taiwanese", "lanzhou", "szechuan", "sichuan", "cantonese", "hot pot", "hotpot", "peking duck", "xiao long bao", "wonton"],
+    "Dim Sum": ["dim sum", "yum cha", "har gow", "siu mai"],
+    "Dumplings": ["dumpling", "gyoza", "xiao long bao", "momo"],
+    "Japanese": ["japanese", "izakaya", "teppanyaki", "teriyaki", "katsu", "donburi", "tempura", "udon", "yakitori", "bento"],
+    "Sushi": ["sushi", "sashimi", "nigiri", "maki"],
+    "Ramen": ["ramen", "tonkotsu"],
+    "Korean": ["korean", "bibimbap", "bulgogi", "kimchi", "korean bbq", "tteokbokki"],
+    "Thai": ["thai", "pad thai", "tom yum", "green curry", "massaman", "pad see ew"],
+    "Vietnamese": ["vietnamese", "pho", "banh mi", "bun bo", "vermicelli"],
+    "Pho": ["pho"],
+    "Malaysian": ["malaysian", "laksa", "nasi lemak", "roti canai", "satay"],
+    "Indonesian": ["indonesian", "nasi goreng", "rendang", "mie goreng"],
+    "Cambodian": ["cambodian", "khmer"],
+    "Burmese": ["burmese", "myanmar"],
+    "Filipino": ["filipino", "adobo", "lechon"],
+    "Noodles": ["noodle", "ramen", "udon", "pho", "laksa", "chow mein", "pad thai"],
+    "Indian": ["indian", "tandoori", "biryani", "naan", "tikka", "masala", "dosa", "paneer", "korma", "vindaloo"],
+    "Nepalese": ["nepalese", "nepali", "momo"],
+    "Sri Lankan": ["sri lankan", "hoppers", "kottu"],
+    "Curry": ["curry", "curries", "masala", "korma", "vindaloo", "rendang", "massaman"],
+    "Halal": ["halal", "afghan"],
+    "Turkish": ["turkish", "kebab", "doner", "kebap", "shish"],
+    "Lebanese": ["lebanese", "shawarma", "falafel", "hummus"],
+    "Persian": ["persian", "iranian"],
+    "Arabic": ["arabic", "arabian", "shawarma"],
+    "Moroccan": ["moroccan", "tagine"],
+    "Egyptian": ["egyptian", "koshari"],
+    "Greek": ["greek", "souvlaki", "gyro", "moussaka"],
+    "Mediterranean": ["mediterranean", "mezze", "meze", "falafel", "hummus"],
+    "Italian": ["italian", "trattoria", "osteria", "risotto", "gnocchi", "tiramisu", "cucina"],
+    "Pizza": ["pizza", "pizzeria", "margherita"],
+    "Pasta": ["pasta", "spaghetti", "lasagne", "lasagna", "carbonara", "fettuccine", "linguine", "ravioli"],
+    "French": ["french", "brasserie", "crepe", "patisserie", "croissant"],
+    "Spanish": ["spanish", "paella", "churros"],
+    "Tapas": ["tapas"],
+    "British": ["british", "english breakfast", "fish and chips", "fish & chips", "pie", "gastropub", "sunday roast"],
+    "Irish": ["irish", "guinness"],
+    "American": ["american", "diner", "hot dog", "mac and cheese", "buffalo wings", "fried chicken"],
+    "Southern": ["southern", "soul food"],
+    "Cajun": ["cajun", "creole", "gumbo"],
+    "Burgers": ["burger", "hamburger", "cheeseburger"],
+    "BBQ": ["bbq", "barbecue", "smokehouse", "brisket", "pulled pork", "smoked"],
+    "Steakhouse": ["steakhouse", "steak house", "steak", "ribeye", "sirloin"],
+    "Bar & Grill": ["bar & grill", "bar and grill", "grill", "bar", "lounge", "pub", "gastropub", "brewpub", "tavern",
+                    "sports bar", "cocktail bar", "wine bar", "taproom", "craft beer"],
+    "Mexican": ["mexican", "taco", "burrito", "quesadilla", "nachos", "enchilada", "taqueria"],
+    "Tex-Mex": ["tex-mex", "tex mex", "fajita", "nachos"],
+    "Latin American": ["latin american", "south american", "colombian", "peruvian", "arepa", "empanada"],
+    "Brazilian": ["brazilian", "churrasco", "churrascaria"],
+    "Pacific Islander": ["pacific island", "samoan", "tongan", "fijian", "hangi"],
+    # Plain "new zealand" is mostly the location in reviews, so only cuisine phrases count.
+    "New Zealand": ["new zealand restaurant", "new zealand cuisine", "kiwi classic", "pavlova", "whitebait", "green-lipped mussel", "bluff oyster", "hangi"],
+    "Australian": ["australian", "aussie"],
+    "Seafood": ["seafood", "fish", "oyster", "mussel", "prawn", "shrimp", "crab", "lobster", "crayfish", "scallop", "salmon", "calamari"],
+    "Vegetarian": ["vegetarian", "veggie"],
+    "Vegan": ["vegan", "plant-based", "plant based"],
+    "Gluten-Free": ["gluten free", "gluten-free", "coeliac", "celiac"],
+    "Cafe": ["cafe", "café", "coffee", "espresso", "flat white", "latte", "sandwich shop"],
+    "Brunch": ["brunch", "breakfast", "eggs benedict", "eggs bene", "pancake", "french toast"],
+    "Bakery": ["bakery", "bakehouse", "pastry", "pastries", "sourdough", "bagel"],
+    "Desserts": ["dessert", "gelato", "ice cream", "cake", "waffle", "sweets", "bubble tea"],
+    "Fast Food": ["fast food", "takeaway", "takeout", "drive-thru", "drive thru", "fried chicken"],
+    "Street Food": ["street food", "hawker", "food truck", "night market", "food court"],
+    "Fusion": ["fusion"],
+    "Casual Dining": ["casual", "bistro", "eatery", "diner", "family restaurant", "family friendly", "family-friendly",
+                      "relaxed atmosphere", "laid back", "laid-back"],
+    "Fine Dining": ["fine dining", "degustation", "tasting menu", "chef's table", "michelin"],
+    "Contemporary": ["contemporary", "modern cuisine", "modern new zealand", "modern european"],
+    "International": ["international", "buffet"],
+}
+
+# Worker-process globals, set once per process by _init_worker().
+_MATCHER: Optional[re.Pattern] = None
+_KEYWORD_CUISINES: Dict[str, List[str]] = {}
+
+
+def _keyword_index(cuisine_keywords: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    index: Dict[str, List[str]] = {}
+    for cuisine, keywords in cuisine_keywords.items():
+        for kw in keywords:
+            index.setdefault(kw.lower(), []).append(cuisine)
+    return index
+
+
+def _trie_regex(words: List[str]) -> str:
+    """
+    Build a regex whose alternations follow a character trie, so the engine
+    branches once per character instead of trying every keyword in turn.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def _to_regex(node: Dict) -> str:
+        ends = "" in node
+        branches = [re.escape(ch) + _to_regex(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            body = "(?:" + body + ")?"
+        return body
+
+    return _to_regex(trie)
+
+
+def build_matcher(cuisine_keywords: Dict[str, List[str]] = CUISINE_KEYWORDS) -> re.Pattern:
+    """Single compiled pattern for every keyword (plural 's'/'es' allowed)."""
+    words = sorted(_keyword_index(cuisine_keywords))
+    return re.compile(r"(?<![\w])(" + _trie_regex(words) + r")(?:e?s)?(?![\w])", re.IGNORECASE)
+
+
+def _init_worker() -> None:
+    global _MATCHER, _KEYWORD_CUISINES
+    _MATCHER = build_matcher()
+    _KEYWORD_CUISINES = _keyword_index(CUISINE_KEYWORDS)
+
+
+def _cuisines_in(text: Optional[str]) -> set:
+    if not text:
+        return set()
+    found = set()
+    for m in _MATCHER.finditer(text):
+        found.update(_KEYWORD_CUISINES.get(m.group(1).lower(), ()))
+    return found
+
+
+def score_restaurant(title: str, types: List[str], review_texts: List[str]) -> Dict[str, float]:
+    """Weighted vote per cuisine: each field / review votes at most once per cuisine."""
+    scores: Dict[str, float] = {}
+
+    def _vote(cuisines: set, weight: float) -> None:
+        for c in cuisines:
+            scores[c] = scores.get(c, 0.0) + weight
+
+    _vote(_cuisines_in(title), FIELD_WEIGHTS["title"])
+    _vote(_cuisines_in(" | ".join(types)), FIELD_WEIGHTS["types"])
+    for text in review_texts:
+        _vote(_cuisines_in(text), FIELD_WEIGHTS["review"])
+    return scores
+
+
+def select_cuisines(scores: Dict[str, float]) -> List[str]:
+    ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+    return [c for c, s in ranked if s >= MIN_SCORE][:MAX_CUISINES]
+
+
+def _tag_chunk(chunk: List[Dict]) -> List[Dict]:
+    out = []
+    for row in chunk:
+        scores = score_restaurant(row["title"], row["types"], row["review_texts"])
+        out.append({
+            "cuisines": select_cuisines(scores),
+            "cuisine_scores": {c: round(s, 2) for c, s in sorted(scores.items(), key=lambda kv: -kv[1])},
+        })
+    return out
+
+
+def _load_place_types(restaurant_ids: pd.Series) -> pd.Series:
+    """Google place types per restaurant_id (empty when the place is unknown)."""
+    if not os.path.exists(INPUT_PLACES):
+        return pd.Series([[] for _ in restaurant_ids], index=restaurant_ids.index)
+
+    places = pd.read_csv(INPUT_PLACES).dropna(subset=["place_id"])
+    types_by_pid = {
+        pid: [t.strip().lower() for t in str(t_str).split(",") if t.strip()]
+        for pid, t_str in zip(places["place_id"], places["type"].fillna(""))
+    }
+    place_ids = match_place_ids(restaurant_ids, types_by_pid)
+    return place_ids.map(lambda pid: types_by_pid.get(pid, []))
+
+
+def tag_cuisines(df: pd.DataFrame) -> pd.DataFrame:
+    types = _load_place_types(df["restaurant_id"])
+    rows = [
+        {
+            "title": title or "",
+            "types": t,
+            "review_texts": [r.get("text") for r in (reviews if reviews is not None else [])],
+        }
+        for title, t, reviews in zip(df["restaurant"], types, df["reviews"])
+    ]
+    chunks = [rows[i:i + CHUNK_SIZE] for i in range(0, len(rows), CHUNK_SIZE)]
+
+    results: List[Dict] = []
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS, initializer=_init_worker) as pool:
+        for tagged in tqdm(pool.map(_tag_chunk, chunks), total=len(chunks), desc="Tagging cuisines"):
+            results.extend(tagged)
+
+    df = df.copy()
+    # Stored as JSON strings, matching the existing stage-03 outputs.
+    df["cuisines"] = [json.dumps(r["cuisines"], ensure_ascii=False) for r in results]
+    df["cuisine_scores"] = [json.dumps(r["cuisine_scores"], ensure_ascii=False) for r in results]
+    return df
+
+
+def save_outputs(df: pd.DataFrame) -> None:
+    os.makedirs(OUT_DIR, exist_ok=True)
+    df.to_parquet(OUTPUT_PARQUET, index=False)
+    df.to_json(OUTPUT_JSON, orient="records", indent=2, force_ascii=False)
+    write_city_partition(df, "restaurants_cuisine", CITY)
+
+
+if __name__ == "__main__":
+    df_merged = pd.read_parquet(INPUT_MERGED)
+    print(f"Restaurants to tag: {len(df_merged)}")
+
+    df_tagged = tag_cuisines(df_merged)
+    untagged = (df_tagged["cuisines"] == "[]").sum()
+    print(f"Tagged: {len(df_tagged) - untagged}, no cuisine above threshold: {untagged}")
+
+    save_outputs(df_tagged)
+    print(f"Finished! Saved {OUTPUT_PARQUET} and {OUTPUT_JSON}")
@@ -0,0 +1,316 @@
+"""
+10-load-qdrant.py
+----------------------------------
+Bulk, idempotent loader for the enriched restaurant reviews into Qdrant.
+
+- Streams the enriched-features Parquet in Arrow record batches
+- Uses the cleaned text from 12-clean-reviews.py when available and skips
+  reviews it dropped (empty, too short, non-English)
+- One point per review; point id = uuid5(restaurant_id + review content hash),
+  so reruns overwrite instead of duplicating and only re-embed reviews whose
+  (cleaned) text changed
+- Reviews already in the collection are not re-embedded; their payload is
+  only rewritten when its hash changed (e.g. new cuisines / place details)
+- Embeds + upserts fixed-size batches from a thread pool (client calls are
+  serialised in local mode, which is not thread-safe)
+- Deletes points (of the same city) whose review no longer exists in the dataset
+- Reports points/sec
+
+Set QDRANT_URL (and QDRANT_API_KEY) for a server; otherwise Qdrant's
+in-process local mode stores the collection under QDRANT_PATH.
+"""
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+import contextlib
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from qdrant_client import QdrantClient, models
+from tqdm import tqdm
+
+from cities import current_city
+
+# ---- Tunables ----
+CITY = current_city()
+FEATURES_PARQUET = CITY.features_parquet
+CLEAN_REVIEWS_PARQUET = CITY.clean_reviews_parquet
+# One collection for all cities; each point carries a "city" payload field to filter on.
+COLLECTION = "restaurant_reviews"
+
+QDRANT_URL = os.getenv("QDRANT_URL")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+QDRANT_PATH = "data/qdrant-local"
+
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+VECTOR_SIZE = 384
+READ_BATCH_ROWS = 128      # restaurants per Arrow record batch
+UPSERT_BATCH_SIZE = 256    # points per upsert request
+MAX_WORKERS = 4            # concurrent upsert requests
+SCROLL_PAGE = 1024
+
+# Fixed namespace so ids are stable across machines and runs.
+POINT_NAMESPACE = uuid.UUID("5d0f8c2e-6a4b-4d0e-9a57-2b1f3c9e7a10")
+
+RESTAURANT_PAYLOAD = [
+    "restaurant", "restaurant_id", "address", "cuisines", "lat", "lon",
+    "price_bucket", "hours_category", "avg_rating", "num_reviews",
+    "has_delivery", "has_takeout", "has_dine_in",
+]
+
+EmbedFn = Callable[[List[str]], List[List[float]]]
+# (restaurant_id, platform, user, date) -> cleaning result. Not keyed on the text:
+# stage 04 stores it re-normalised, so its hash differs from the stage-02 text the cleaner saw.
+CleanIndex = Dict[Tuple, Dict]
+
+
+def review_hash(review: Dict) -> str:
+    key = "\x1f".join(str(review.get(k) or "") for k in ("platform", "user", "date", "text"))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def payload_hash(payload: Dict) -> str:
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def point_id(restaurant_id: str, review: Dict) -> str:
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{restaurant_id}:{review_hash(review)}"))
+
+
+def load_clean_index(path: str = CLEAN_REVIEWS_PARQUET) -> Optional[CleanIndex]:
+    """Cleaned text per review from 12-clean-reviews.py, or None if it has not run."""
+    if not os.path.exists(path):
+        return None
+    columns = ["restaurant_id", "platform", "user", "date", "text_clean", "lang", "quality_score", "keep"]
+    return {
+        (r["restaurant_id"], r["platform"], r["user"], r["date"]): r
+        for r in pq.read_table(path, columns=columns).to_pylist()
+    }
+
+
+def _clean_review(restaurant_id: str, review: Dict, clean_index: CleanIndex) -> Tuple[Optional[Dict], bool]:
+    """
+    (review with its cleaned text or None if cleaning dropped it, found in index).
+    Reviews the cleaner has not seen yet keep their raw text.
+    """
+    clean = clean_index.get((restaurant_id, review.get("platform"), review.get("user"), review.get("date")))
+    if clean is None:
+        return review, False
+    if not clean["keep"]:
+        return None, True
+    return {**review, "text": clean["text_clean"], "lang": clean["lang"], "quality_score": clean["quality_score"]}, True
+
+
+def iter_review_points(
+    path: str = FEATURES_PARQUET,
+    city: str = CITY.slug,
+    clean_index: Optional[CleanIndex] = None,
+    counters: Optional[Dict[str, int]] = None,
+) -> Iterator[Dict]:
+    """
+    Yield {id, text, payload} per review without materialising the whole file.
+    counters["clean_misses"] counts reviews missing from clean_index.
+    """
+    counters = counters if counters is not None else {}
+    counters.setdefault("clean_misses", 0)
+    parquet = pq.ParquetFile(path)
+    columns = [c for c in RESTAURANT_PAYLOAD + ["reviews"] if c in parquet.schema_arrow.names]
+
+    for batch in parquet.iter_batches(batch_size=READ_BATCH_ROWS, columns=columns):
+        for row in batch.to_pylist():
+            restaurant = {k: row.get(k) for k in RESTAURANT_PAYLOAD if k in row}
+            restaurant["city"] = city
+            for review in row.get("reviews") or []:
+                if clean_index is not None:
+                    review, found = _clean_review(row["restaurant_id"], review, clean_index)
+                    counters["clean_misses"] += not found
+                    if review is None:
+                        continue
+                text = (review.get("text") or "").strip()
+                if not text:
+                    continue
+                payload = {**restaurant, **review, "review_hash": review_hash(review)}
+                payload["payload_hash"] = payload_hash(payload)
+                yield {
+                    "id": point_id(row["restaurant_id"], review),
+                    "text": text,
+                    "payload": payload,
+                }
+
+
+def _batched(items: Iterator[Dict], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def default_embedder() -> EmbedFn:
+    # Imported lazily: the model download is only needed when actually embedding.
+    from fastembed import TextEmbedding
+
+    model = TextEmbedding(EMBEDDING_MODEL)
+    return lambda texts: [v.tolist() for v in model.embed(texts)]
+
+
+def get_client() -> QdrantClient:
+    if QDRANT_URL:
+        return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+    return QdrantClient(path=QDRANT_PATH)
+
+
+def ensure_collection(client: QdrantClient, collection: str = COLLECTION, vector_size: int = VECTOR_SIZE) -> None:
+    if not client.collection_exists(collection):
+        client.create_collection(
+            collection_name=collection,
+            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+        )
+
+
+def is_local(client: QdrantClient) -> bool:
+    options = client.init_options
+    return options.get("path") is not None or options.get("location") == ":memory:"
+
+
+def existing_payload_hashes(client: QdrantClient, collection: str, ids: Sequence[str]) -> Dict[str, Optional[str]]:
+    """point id -> stored payload_hash for the ids already in the collection."""
+    found = client.retrieve(collection_name=collection, ids=list(ids), with_payload=["payload_hash"], with_vectors=False)
+    return {str(p.id): (p.payload or {}).get("payload_hash") for p in found}
+
+
+def all_point_ids(client: QdrantClient, collection: str, city: str) -> Set[str]:
+    ids: Set[str] = set()
+    offset = None
+    city_filter = models.Filter(must=[models.FieldCondition(key="city", match=models.MatchValue(value=city))])
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection, limit=SCROLL_PAGE, offset=offset,
+            scroll_filter=city_filter, with_payload=False, with_vectors=False,
+        )
+        ids.update(str(p.id) for p in points)
+        if offset is None:
+            return ids
+
+
+def _upsert_batch(client: QdrantClient, collection: str, batch: List[Dict], embed: EmbedFn, client_lock) -> Tuple[int, int]:
+    """
+    Embed + upsert the points not already stored; overwrite the payload of stored
+    points whose payload changed. Returns (points written, payloads updated).
+    """
+    with client_lock:
+        present = existing_payload_hashes(client, collection, [p["id"] for p in batch])
+    todo = [p for p in batch if p["id"] not in present]
+    stale = [p for p in batch if p["id"] in present and present[p["id"]] != p["payload"]["payload_hash"]]
+
+    if stale:
+        operations = [
+            models.OverwritePayloadOperation(
+                overwrite_payload=models.SetPayload(payload=p["payload"], points=[p["id"]])
+            )
+            for p in stale
+        ]
+        with client_lock:
+            client.batch_update_points(collection_name=collection, update_operations=operations, wait=True)
+    if not todo:
+        return 0, len(stale)
+
+    vectors = embed([p["text"] for p in todo])
+    points = [
+        models.PointStruct(id=p["id"], vector=vec, payload=p["payload"])
+        for p, vec in zip(todo, vectors)
+    ]
+    with client_lock:
+        client.upsert(collection_name=collection, points=points, wait=True)
+    return len(todo), len(stale)
+
+
+def load_reviews(
+    client: QdrantClient,
+    embed: Optional[EmbedFn] = None,
+    path: str = FEATURES_PARQUET,
+    city: str = CITY.slug,
+    clean_path: str = CLEAN_REVIEWS_PARQUET,
+    collection: str = COLLECTION,
+    vector_size: int = VECTOR_SIZE,
+    max_workers: int = MAX_WORKERS,
+) -> Dict[str, float]:
+    """Sync the collection with the dataset. Returns load statistics."""
+    embed = embed or default_embedder()
+    ensure_collection(client, collection, vector_size)
+
+    client_lock = threading.Lock() if is_local(client) else contextlib.nullcontext()
+    seen: Set[str] = set()
+    written = 0
+    updated = 0
+    t0 = time.perf_counter()
+
+    def _track(points: Iterator[Dict]) -> Iterator[Dict]:
+        for p in points:
+            if p["id"] in seen:     # identical review listed twice for one restaurant
+                continue
+            seen.add(p["id"])
+            yield p
+
+    clean_index = load_clean_index(clean_path)
+    if clean_index is None:
+        print(f"No cleaned reviews at {clean_path} — loading raw text (run 12-clean-reviews.py).")
+    counters: Dict[str, int] = {}
+    points = iter_review_points(path, city, clean_index, counters)
+    batches = _batched(_track(points), UPSERT_BATCH_SIZE)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Bounded in-flight window so the Parquet is streamed, not read ahead in full.
+        in_flight = []
+        with tqdm(desc="Upserting reviews", unit="pt") as bar:
+            for batch in batches:
+                in_flight.append((pool.submit(_upsert_batch, client, collection, batch, embed, client_lock), len(batch)))
+                if len(in_flight) >= max_workers * 2:
+                    fut, n = in_flight.pop(0)
+                    w, u = fut.result()
+                    written, updated = written + w, updated + u
+                    bar.update(n)
+            for fut, n in in_flight:
+                w, u = fut.result()
+                written, updated = written + w, updated + u
+                bar.update(n)
+
+    stale = list(all_point_ids(client, collection, city) - seen)
+    for i in range(0, len(stale), UPSERT_BATCH_SIZE):
+        client.delete(
+            collection_name=collection,
+            points_selector=models.PointIdsList(points=stale[i:i + UPSERT_BATCH_SIZE]),
+            wait=True,
+        )
+
+    if counters["clean_misses"]:
+        print(f"WARNING: {counters['clean_misses']} reviews not found in {clean_path}; loaded with raw text "
+              f"and no language/quality filter (rerun 12-clean-reviews.py).")
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "reviews": len(seen),
+        "upserted": written,
+        "payload_updated": updated,
+        "unchanged": len(seen) - written - updated,
+        "deleted": len(stale),
+        "clean_misses": counters["clean_misses"],
+        "seconds": elapsed,
+        "points_per_sec": written / elapsed if elapsed else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    client = get_client()
+    stats = load_reviews(client)
+
+    print(f"Reviews in dataset: {stats['reviews']}")
+    print(f"Upserted: {stats['upserted']}  payload updated: {stats['payload_updated']}  "
+          f"unchanged: {stats['unchanged']}  deleted: {stats['deleted']}")
+    print(f"Throughput: {stats['points_per_sec']:.0f} points/sec ({stats['seconds']:.1f}s)")
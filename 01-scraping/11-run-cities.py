@@ -0,0 +1,68 @@
+"""
+11-run-cities.py
+----------------------------------
+Run one pipeline stage for several cities in parallel under a shared SerpApi budget.
+
+Each city runs as its own process with CITY=<slug>. The total call budget and
+hourly rate limit are split evenly, via SERPAPI_MAX_CALLS / SERPAPI_MIN_INTERVAL_S
+(enforced by cities.ApiBudget inside every scraper).
+
+Usage:
+    python 11-run-cities.py 04-scrape-google-restaurants.py christchurch auckland wellington
+    python 11-run-cities.py 09-tag-cuisines.py --all
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from cities import CITIES
+
+# ---- Tunables ----
+TOTAL_MAX_CALLS = os.getenv("SERPAPI_TOTAL_CALLS")   # unset = no cap
+CALLS_PER_HOUR = 1000                                 # SerpApi plan throughput limit
+
+
+def city_env(n_cities: int, slug: str) -> Dict[str, str]:
+    env = dict(os.environ, CITY=slug)
+    if TOTAL_MAX_CALLS:
+        env["SERPAPI_MAX_CALLS"] = str(int(TOTAL_MAX_CALLS) // n_cities)
+    env["SERPAPI_MIN_INTERVAL_S"] = f"{3600.0 * n_cities / CALLS_PER_HOUR:.3f}"
+    return env
+
+
+def run_city(script: str, slug: str, n_cities: int) -> int:
+    print(f"[{slug}] starting {script}")
+    proc = subprocess.run([sys.executable, script], env=city_env(n_cities, slug))
+    print(f"[{slug}] finished with exit code {proc.returncode}")
+    return proc.returncode
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("script", help="pipeline script to run, e.g. 04-scrape-google-restaurants.py")
+    parser.add_argument("cities", nargs="*", help=f"city slugs ({', '.join(CITIES)})")
+    parser.add_argument("--all", action="store_true", help="run every registered city")
+    args = parser.parse_args(argv)
+
+    cities = list(CITIES) if args.all else args.cities
+    unknown = [c for c in cities if c not in CITIES]
+    if not cities or unknown:
+        parser.error(f"choose cities from: {', '.join(CITIES)} (unknown: {', '.join(unknown) or '-'})")
+
+    with ThreadPoolExecutor(max_workers=len(cities)) as pool:
+        codes = list(pool.map(lambda slug: run_city(args.script, slug, len(cities)), cities))
+
+    failed = [slug for slug, code in zip(cities, codes) if code != 0]
+    if failed:
+        print(f"Failed cities: {', '.join(failed)}")
+        return 1
+    print(f"All {len(cities)} cities finished.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""
+12-clean-reviews.py
+----------------------------------
+Review text cleaning + language filtering for the merged dataset (stage 02).
+
+- Vectorised normalisation per batch (pandas .str ops): Unicode NFKC,
+  "(Translated by Google)" boilerplate, emoji / zero-width noise,
+  repeated punctuation and whitespace
+- Offline language detection with no model download: Unicode-script counts,
+  then stopword hits per language for Latin-script text
+- Per-review quality score (length, lexical variety, letter ratio) and a keep
+  flag (enough words, language in KEEP_LANGS)
+- Batches run across a process pool; reviews whose raw text is unchanged since
+  the last run reuse their previous result
+- content_hash = sha1 of the cleaned text, so 10-load-qdrant.py only re-embeds
+  reviews whose cleaned text changed
+
+Output: one row per review in <city>_reviews_clean.parquet (next to the merged
+dataset) + the city-partitioned reviews_clean dataset (CITY env var).
+"""
+
+import os
+import re
+import math
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from tqdm import tqdm
+
+from cities import current_city, write_city_partition
+
+# ---- Tunables ----
+CITY = current_city()
+INPUT_MERGED = CITY.merged_parquet
+OUTPUT_PARQUET = CITY.clean_reviews_parquet
+
+KEEP_LANGS = {"en"}
+MIN_WORDS = 2            # "Great!" alone carries nothing worth embedding
+TARGET_WORDS = 50        # length score saturates here
+QUALITY_WEIGHTS = {"length": 0.6, "variety": 0.25, "letters": 0.15}
+MAX_WORKERS = os.cpu_count() or 4
+BATCH_SIZE = 2000        # reviews per worker task
+
+# A review is identified by these fields; raw_hash detects edits to its text.
+KEY_COLUMNS = ["restaurant_id", "platform", "user", "date"]
+CLEAN_COLUMNS = ["text_clean", "lang", "translated", "n_words", "quality_score", "keep", "content_hash"]
+
+# ---- Normalisation patterns ----
+# RE2 syntax: batches are Arrow-backed strings, so pandas runs these in pyarrow.compute.
+# Google: "(Translated by Google) <English>\n\n(Original)\n<source text>"
+TRANSLATED_PREFIX = r"^\s*\(Translated by Google\)\s*"
+ORIGINAL_SUFFIX = r"\s*\(Original\)[\s\S]*$"
+ZERO_WIDTH = r"[\x{200B}-\x{200F}\x{2060}\x{FEFF}]"
+EMOJI = (
+    r"[\x{1F000}-\x{1FAFF}\x{1F1E6}-\x{1F1FF}\x{2600}-\x{27BF}\x{2B00}-\x{2BFF}"
+    r"\x{2E3A}\x{2E3B}\x{FE0F}\x{20E3}]+"
+)
+
+# Non-Latin scripts: dominant script decides the language outright.
+SCRIPT_PATTERNS = {
+    "zh": r"\p{Han}",
+    "ja": r"[\p{Hiragana}\p{Katakana}]",
+    "ko": r"\p{Hangul}",
+    "th": r"\p{Thai}",
+    "ru": r"\p{Cyrillic}",
+    "ar": r"\p{Arabic}",
+    "hi": r"\p{Devanagari}",
+}
+LATIN = r"\p{Latin}"
+
+# Latin-script languages: most function-word hits wins (ties go to the first listed).
+STOPWORDS: Dict[str, List[str]] = {
+    "en": ["the", "and", "is", "was", "were", "to", "of", "with", "for", "this", "that", "it",
+           "very", "but", "not", "are", "have", "had", "we", "they", "you", "my", "our",
+           "food", "great", "good", "place", "staff", "service", "delicious", "friendly",
+           "nice", "amazing", "best", "really", "lovely"],
+    "es": ["el", "la", "los", "las", "que", "muy", "con", "por", "para", "una", "pero", "comida", "y", "del"],
+    "fr": ["le", "les", "des", "est", "très", "avec", "pour", "une", "et", "mais", "nous", "c'est", "bon", "pas", "du"],
+    "de": ["der", "die", "das", "und", "ist", "sehr", "mit", "nicht", "ein", "eine", "wir", "essen", "gut", "auch"],
+    "it": ["il", "che", "molto", "per", "ma", "non", "sono", "cibo", "buono", "della", "gli"],
+    "pt": ["os", "muito", "com", "não", "uma", "mas", "comida", "boa", "bom", "do", "da"],
+    "nl": ["het", "een", "en", "zeer", "heel", "met", "niet", "lekker", "wij", "eten", "van", "voor"],
+}
+# Latin text with no function-word hits at all ("taco gooood!") is almost always English here.
+DEFAULT_LATIN_LANG = "en"
+
+
+def text_hash(text: Optional[str]) -> str:
+    return hashlib.sha1((text or "").encode("utf-8")).hexdigest()
+
+
+def _word_regex(words: List[str]) -> str:
+    return r"\b(?:" + "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True)) + r")\b"
+
+
+_STOPWORD_PATTERNS = {lang: _word_regex(words) for lang, words in STOPWORDS.items()}
+
+
+def normalize_texts(raw: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Return (cleaned text, translated-by-Google flag) for a batch of raw texts."""
+    s = raw.fillna("").str.normalize("NFKC")
+    translated = s.str.contains(TRANSLATED_PREFIX, regex=True)
+    s = s.str.replace(TRANSLATED_PREFIX, "", regex=True)
+    s = s.where(~translated, s.str.replace(ORIGINAL_SUFFIX, "", regex=True))
+    s = s.str.replace(ZERO_WIDTH, "", regex=True)
+    s = s.str.replace(EMOJI, " ", regex=True)
+    s = s.str.replace(r"!{2,}", "!", regex=True).str.replace(r"\?{2,}", "?", regex=True)
+    s = s.str.replace(r"\.{4,}", "...", regex=True)
+    s = s.str.replace(r"\s+", " ", regex=True).str.strip()
+    # Emoji become spaces above, which would strand punctuation: "food 😍!" -> "food !".
+    s = s.str.replace(r" ([!?.,;:])", r"\1", regex=True)
+    return s, translated
+
+
+def detect_languages(text: pd.Series) -> pd.Series:
+    """ISO 639-1 code per text ('und' when there are no letters)."""
+    script_counts = pd.DataFrame({lang: text.str.count(p) for lang, p in SCRIPT_PATTERNS.items()})
+    latin = text.str.count(LATIN)
+
+    # Kana only appears in Japanese, which also uses Han characters.
+    has_kana = script_counts["ja"] > 0
+    script_counts.loc[has_kana, "ja"] += script_counts.loc[has_kana, "zh"]
+    script_counts.loc[has_kana, "zh"] = 0
+
+    top_script = script_counts.idxmax(axis=1)
+    top_count = script_counts.max(axis=1)
+
+    lower = text.str.lower()
+    stop_hits = pd.DataFrame({lang: lower.str.count(p) for lang, p in _STOPWORD_PATTERNS.items()})
+    latin_lang = stop_hits.idxmax(axis=1).where(stop_hits.max(axis=1) > 0, DEFAULT_LATIN_LANG)
+
+    lang = latin_lang.where(latin >= top_count, top_script)
+    return lang.where((latin + top_count) > 0, "und")
+
+
+def quality_scores(text: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Return (word count, quality score in [0, 1])."""
+    words = text.str.lower().str.replace(r"[^\p{L}\p{N}\s]+", " ", regex=True).str.split()
+    n_words = words.str.len().astype("int64")
+    lengths = text.str.len().clip(lower=1)
+
+    length_score = (n_words.map(math.log1p) / math.log1p(TARGET_WORDS)).clip(upper=1.0)
+    variety = words.map(lambda w: len(set(w)) / len(w) if w else 0.0)
+    letters = text.str.count(r"\p{L}") / lengths
+
+    score = (
+        QUALITY_WEIGHTS["length"] * length_score
+        + QUALITY_WEIGHTS["variety"] * variety
+        + QUALITY_WEIGHTS["letters"] * letters
+    )
+    return n_words, score.round(3)
+
+
+def _clean_batch(raw_texts: List[Optional[str]]) -> Dict[str, list]:
+    raw = pd.Series(raw_texts, dtype="string[pyarrow]")
+    text, translated = normalize_texts(raw)
+    lang = detect_languages(text)
+    n_words, quality = quality_scores(text)
+    keep = (n_words >= MIN_WORDS) & lang.isin(KEEP_LANGS)
+    return {
+        "text_clean": text.tolist(),
+        "lang": lang.tolist(),
+        "translated": translated.tolist(),
+        "n_words": n_words.tolist(),
+        "quality_score": quality.tolist(),
+        "keep": keep.tolist(),
+        "content_hash": [text_hash(t) for t in text],
+    }
+
+
+def explode_reviews(table: pa.Table) -> pd.DataFrame:
+    """One row per review: restaurant_id + the review struct fields + raw_hash."""
+    reviews = table.column("reviews").combine_chunks()
+    flat = pc.list_flatten(reviews)
+    parents = pc.list_parent_indices(reviews)
+
+    df = pa.Table.from_arrays(
+        [pc.take(table.column("restaurant_id"), parents)] + flat.flatten(),
+        names=["restaurant_id"] + [f.name for f in flat.type],
+    ).to_pandas()
+    df["raw_hash"] = [text_hash(t) for t in df["text"]]
+    # Same review listed twice for one restaurant.
+    return df.drop_duplicates(KEY_COLUMNS + ["raw_hash"]).reset_index(drop=True)
+
+
+def load_previous(path: str = OUTPUT_PARQUET) -> Optional[pd.DataFrame]:
+    if not os.path.exists(path):
+        return None
+    prev = pd.read_parquet(path, columns=KEY_COLUMNS + ["raw_hash"] + CLEAN_COLUMNS)
+    return prev.drop_duplicates(KEY_COLUMNS + ["raw_hash"])
+
+
+def clean_reviews(df: pd.DataFrame, previous: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """Attach CLEAN_COLUMNS to every review, cleaning only raw texts not seen last run."""
+    if previous is not None:
+        df = df.merge(previous, on=KEY_COLUMNS + ["raw_hash"], how="left")
+        todo = df["content_hash"].isna()
+    else:
+        df = df.reindex(columns=list(df.columns) + CLEAN_COLUMNS)
+        todo = pd.Series(True, index=df.index)
+
+    todo_idx = df.index[todo]
+    texts = df.loc[todo_idx, "text"].tolist()
+    batches = [texts[i:i + BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+
+    cleaned: Dict[str, list] = {c: [] for c in CLEAN_COLUMNS}
+    if batches:
+        with ProcessPoolExecutor(max_workers=min(MAX_WORKERS, len(batches))) as pool:
+            for result in tqdm(pool.map(_clean_batch, batches), total=len(batches), desc="Cleaning reviews"):
+                for c in CLEAN_COLUMNS:
+                    cleaned[c].extend(result[c])
+
+    df[CLEAN_COLUMNS] = df[CLEAN_COLUMNS].astype("object")
+    for c in CLEAN_COLUMNS:
+        df.loc[todo_idx, c] = pd.Series(cleaned[c], index=todo_idx, dtype="object")
+    df = df.astype({"translated": bool, "keep": bool, "n_words": "int64", "quality_score": "float64"})
+
+    changed = len(todo_idx)
+    if previous is not None:
+        # Raw text edited, but the cleaned text (and so every downstream artefact) is the same.
+        before = previous.drop_duplicates(KEY_COLUMNS).set_index(KEY_COLUMNS)["content_hash"]
+        now = df.loc[todo_idx].set_index(KEY_COLUMNS)["content_hash"]
+        changed -= int((now == before.reindex(now.index)).sum())
+
+    stats = {
+        "reviews": len(df),
+        "reused": len(df) - len(todo_idx),
+        "cleaned": len(todo_idx),
+        "content_changed": changed,
+        "kept": int(df["keep"].sum()),
+    }
+    return df, stats
+
+
+def save_outputs(df: pd.DataFrame, path: str = OUTPUT_PARQUET) -> None:
+    columns = KEY_COLUMNS + ["rating", "text", "raw_hash"] + CLEAN_COLUMNS
+    out = df[columns]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    out.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+    write_city_partition(out, "reviews_clean", CITY)
+
+
+if __name__ == "__main__":
+    df_reviews = explode_reviews(pq.read_table(INPUT_MERGED, columns=["restaurant_id", "reviews"]))
+    print(f"Reviews in merged dataset: {len(df_reviews)}")
+
+    df_clean, stats = clean_reviews(df_reviews, load_previous())
+    print(f"Cleaned: {stats['cleaned']}  reused: {stats['reused']}  "
+          f"content changed: {stats['content_changed']}")
+    print(f"Kept: {stats['kept']}  dropped: {stats['reviews'] - stats['kept']}")
+    print(df_clean.loc[~df_clean["keep"], "lang"].value_counts().to_string())
+
+    save_outputs(df_clean)
+    print(f"Finished! Saved {OUTPUT_PARQUET}")
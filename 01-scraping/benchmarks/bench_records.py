@@ -0,0 +1,136 @@
+"""
+bench_records.py
+----------------------------------
+Microbenchmark: flattened Yelp reviews as 12-key dicts + pd.DataFrame
+(the previous approach in 02-scrape-yelp-reviews.py) vs slotted
+YelpReview records + batched Arrow conversion.
+
+Memory is measured in a fresh process per approach: tracemalloc only sees
+Python allocations, so Arrow buffers (the Arrow path and pandas' Arrow-backed
+string columns alike) are counted separately through the Arrow memory pool's
+peak. The "total" peak adds the two peaks, an upper bound.
+
+Run from 01-scraping/:
+    python benchmarks/bench_records.py [N_REVIEWS]
+"""
+
+import gc
+import multiprocessing as mp
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from records import YelpReview, records_to_table  # noqa: E402
+
+N_REVIEWS = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+
+def make_raw_reviews(n):
+    """Synthetic SerpApi yelp_reviews payloads shaped like the real ones."""
+    return [
+        {
+            "position": i % 49 + 1,
+            "user": {
+                "name": f"User {i}",
+                "link": f"https://www.yelp.com/user_details?userid={i:022d}",
+                "address": "Christchurch, New Zealand",
+            },
+            "comment": {"text": f"Review number {i}. Great food, friendly staff, would come back."},
+            "date": "11/5/2025",
+            "rating": i % 5 + 1,
+            "feedback": {"useful": i % 3, "funny": i % 2, "cool": i % 4},
+            "review_type": "recommended",
+        }
+        for i in range(n)
+    ]
+
+
+def flatten_dicts(raw):
+    rows = []
+    for r in raw:
+        rows.append({
+            "place_id": "bench-place",
+            "review_type": r.get("review_type"),
+            "user": r.get("user", {}).get("name"),
+            "rating": r.get("rating"),
+            "date": r.get("date"),
+            "text": r.get("comment", {}).get("text", ""),
+            "review_position": r.get("position"),
+            "user_address": r.get("user", {}).get("address"),
+            "useful": r.get("feedback", {}).get("useful"),
+            "cool": r.get("feedback", {}).get("cool"),
+            "funny": r.get("feedback", {}).get("funny"),
+            "user_link": r.get("user", {}).get("link"),
+        })
+    return rows
+
+
+def flatten_records(raw):
+    return [YelpReview.from_serpapi("bench-place", r) for r in raw]
+
+
+def records_to_frame(rows):
+    return records_to_table(rows, YelpReview).to_pandas()
+
+
+def _memory_pass(flatten, to_frame, n, out):
+    """Runs in a child process so the Arrow pool peak starts clean."""
+    raw = make_raw_reviews(n)
+    gc.collect()
+    arrow_base = pa.total_allocated_bytes()
+
+    tracemalloc.start()
+    rows = flatten(raw)
+    py_held, _ = tracemalloc.get_traced_memory()
+    to_frame(rows)
+    _, py_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    out.put({
+        "py_held": py_held,
+        "py_peak": py_peak,
+        "arrow_peak": pa.default_memory_pool().max_memory() - arrow_base,
+    })
+
+
+def measure(label, flatten, to_frame, raw):
+    # Timing and memory are separate passes: tracemalloc skews timings.
+    gc.collect()
+    t0 = time.perf_counter()
+    rows = flatten(raw)
+    t1 = time.perf_counter()
+    df = to_frame(rows)
+    t2 = time.perf_counter()
+    assert len(df) == len(raw)
+    del rows, df
+
+    ctx = mp.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_memory_pass, args=(flatten, to_frame, len(raw), out))
+    proc.start()
+    mem = out.get()
+    proc.join()
+
+    mem["peak"] = mem["py_peak"] + mem["arrow_peak"]
+    print(f"{label:<18} flatten {t1 - t0:6.3f}s  to-frame {t2 - t1:6.3f}s  "
+          f"held {mem['py_held'] / 2**20:6.1f} MiB  "
+          f"peak py {mem['py_peak'] / 2**20:6.1f} + arrow {mem['arrow_peak'] / 2**20:6.1f} "
+          f"= {mem['peak'] / 2**20:6.1f} MiB")
+    return t2 - t0, mem
+
+
+if __name__ == "__main__":
+    raw = make_raw_reviews(N_REVIEWS)
+    print(f"Flattening {N_REVIEWS:,} reviews\n")
+
+    t_dict, m_dict = measure("dict + DataFrame", flatten_dicts, pd.DataFrame, raw)
+    t_rec, m_rec = measure("slots + Arrow", flatten_records, records_to_frame, raw)
+
+    print(f"\nTime saved:   {t_dict - t_rec:6.3f}s ({t_dict / t_rec:.1f}x)")
+    print(f"Memory saved: {(m_dict['py_held'] - m_rec['py_held']) / 2**20:6.1f} MiB held, "
+          f"{(m_dict['peak'] - m_rec['peak']) / 2**20:6.1f} MiB total peak")
@@ -0,0 +1,230 @@
+"""
+cities.py
+----------------------------------
+City as a first-class partition key for the whole pipeline.
+
+- CITIES registry + current_city() (selected with the CITY env var)
+- Per-city file naming shared by discovery, review scraping, merge and enrichment
+- match_place_ids(): maps merged-dataset restaurant_ids back to Google place_ids
+- write_city_partition() / read_cities(): hive-partitioned Parquet dataset
+  (../data/partitioned/<dataset>/city=<slug>/) so any subset of cities can be
+  queried without reading the others
+- ApiBudget: per-process SerpApi call cap + minimum spacing, which
+  11-run-cities.py splits across cities running in parallel
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+PARTITIONED_ROOT = Path("../data/partitioned")
+
+DISCOVERY_TEMPLATES = [
+    "restaurants in {city}",
+    "bars in {city}",
+    "food in {city}",
+    "vietnamese restaurant in {city}",
+    "chinese restaurant in {city}",
+    "thai restaurant in {city}",
+    "japanese restaurant in {city}",
+    "indian restaurant in {city}",
+]
+
+
+@dataclass(frozen=True)
+class City:
+    slug: str       # partition value, e.g. "christchurch"
+    prefix: str     # short file prefix, e.g. "chc"
+    name: str       # SerpApi location text
+
+    @property
+    def label(self) -> str:
+        return self.name.split(",")[0]
+
+    @property
+    def discovery_queries(self) -> List[str]:
+        return [t.format(city=self.name) for t in DISCOVERY_TEMPLATES]
+
+    # ---- Stage paths (relative to 01-scraping/) ----
+    # Discovery outputs: written by 00 / 04, read by 02 / 05 / 07 / 09.
+    @property
+    def yelp_place_ids_csv(self) -> str:
+        return f"data/yelp-data/{self.slug}-place-ids.csv"
+
+    @property
+    def yelp_place_ids_json(self) -> str:
+        return f"data/yelp-data/{self.slug}-place-ids.json"
+
+    @property
+    def google_places_dir(self) -> str:
+        return "data/google-data/google-restaurants-place"
+
+    @property
+    def google_places_csv(self) -> str:
+        return f"{self.google_places_dir}/{self.prefix}_google_places.csv"
+
+    @property
+    def google_places_parquet(self) -> str:
+        return f"{self.google_places_dir}/{self.prefix}_google_places.parquet"
+
+    @property
+    def google_places_jsonl(self) -> str:
+        return f"{self.google_places_dir}/{self.prefix}_google_places.jsonl"
+
+    @property
+    def merged_parquet(self) -> str:
+        return f"../data/02-{self.prefix}-restaurant-merged/{self.prefix}_restaurants_reviews_merged.parquet"
+
+    @property
+    def clean_reviews_parquet(self) -> str:
+        return f"../data/02-{self.prefix}-restaurant-merged/{self.prefix}_reviews_clean.parquet"
+
+    @property
+    def cuisine_dir(self) -> str:
+        return f"../data/03-{self.prefix}-restaurant-enriched-cuisine"
+
+    @property
+    def features_parquet(self) -> str:
+        return (f"../data/04-{self.prefix}-restaurant-enriched-features/"
+                f"{self.prefix}_restaurants_enriched_features.parquet")
+
+
+CITIES: Dict[str, City] = {
+    "christchurch": City("christchurch", "chc", "Christchurch, New Zealand"),
+    "auckland": City("auckland", "akl", "Auckland, New Zealand"),
+    "wellington": City("wellington", "wlg", "Wellington, New Zealand"),
+    "queenstown": City("queenstown", "zqn", "Queenstown, New Zealand"),
+    "dunedin": City("dunedin", "dud", "Dunedin, New Zealand"),
+}
+
+DEFAULT_CITY = "christchurch"
+
+
+def current_city() -> City:
+    slug = os.getenv("CITY", DEFAULT_CITY).strip().lower()
+    if slug not in CITIES:
+        raise RuntimeError(f"Unknown CITY '{slug}'. Known cities: {', '.join(CITIES)}")
+    return CITIES[slug]
+
+
+# ---- Restaurant id -> Google place_id ----
+def match_place_ids(restaurant_ids: pd.Series, place_ids: Iterable[str]) -> pd.Series:
+    """
+    restaurant_id is '<slugified title>-<lowercased place_id>'. Place ids may
+    themselves contain '-', so try every suffix rather than the last token.
+    Unmatched ids map to None.
+    """
+    by_key = {pid.lower(): pid for pid in place_ids}
+
+    def _lookup(rid: str) -> Optional[str]:
+        parts = rid.split("-")
+        for i in range(1, len(parts)):
+            pid = by_key.get("-".join(parts[i:]))
+            if pid:
+                return pid
+        return None
+
+    return restaurant_ids.map(_lookup)
+
+
+# ---- City-partitioned Parquet dataset ----
+def partition_dir(dataset: str, city: City) -> Path:
+    return PARTITIONED_ROOT / dataset / f"city={city.slug}"
+
+
+def write_city_partition(df: pd.DataFrame, dataset: str, city: City, schema: Optional[pa.Schema] = None) -> Path:
+    """
+    Replace one city's partition of a dataset; other cities are untouched.
+    Columns named in `schema` are written with its types, so a city whose
+    column happens to be all-null or NaN-holed still gets the dataset's types.
+    """
+    out_dir = partition_dir(dataset, city)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / "part-0.parquet"
+    tmp_path = out_dir / f".part-0.parquet.{os.getpid()}.tmp"
+
+    # The partition value lives in the directory name, not in the file.
+    table = pa.Table.from_pandas(df.drop(columns=["city"], errors="ignore"), preserve_index=False)
+    if schema is not None:
+        pinned = {f.name: f.type for f in schema}
+        table = table.cast(pa.schema([
+            pa.field(f.name, pinned.get(f.name, f.type)) for f in table.schema
+        ], metadata=table.schema.metadata))
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_cities(dataset: str, cities: Optional[Iterable[str]] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Load a dataset for the given city slugs only (all cities if None).
+
+    Only the selected city=<slug> directories are opened, and their file
+    schemas are unified (null -> any type, int -> float, string -> large_string)
+    instead of taking the first file's schema for every city.
+    """
+    dataset_dir = PARTITIONED_ROOT / dataset
+    # Dot-prefixed temp files from in-flight writes are skipped.
+    if cities is None:
+        city_dirs = sorted(dataset_dir.glob("city=*"))
+    else:
+        city_dirs = [dataset_dir / f"city={slug}" for slug in cities]
+    files = [str(f) for d in city_dirs if d.is_dir() for f in sorted(d.glob("[!.]*.parquet"))]
+    if not files:
+        return pd.DataFrame(columns=columns)
+
+    schema = pa.unify_schemas([pq.read_schema(f) for f in files], promote_options="permissive")
+    schema = schema.append(pa.field("city", pa.string()))
+    part = ds.dataset(files, schema=schema, format="parquet",
+                      partitioning="hive", partition_base_dir=str(dataset_dir))
+    return part.to_table(columns=columns).to_pandas()
+
+
+# ---- Shared SerpApi budget ----
+class BudgetExhausted(RuntimeError):
+    pass
+
+
+class ApiBudget:
+    """
+    Thread-safe SerpApi call cap + minimum interval between calls for this
+    process. 11-run-cities.py gives each city process its share through
+    SERPAPI_MAX_CALLS / SERPAPI_MIN_INTERVAL_S.
+    """
+
+    def __init__(self, max_calls: Optional[int] = None, min_interval_s: float = 0.0):
+        self.max_calls = max_calls
+        self.min_interval_s = min_interval_s
+        self.used = 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ApiBudget":
+        max_calls = os.getenv("SERPAPI_MAX_CALLS")
+        return cls(
+            max_calls=int(max_calls) if max_calls else None,
+            min_interval_s=float(os.getenv("SERPAPI_MIN_INTERVAL_S", "0")),
+        )
+
+    def acquire(self) -> None:
+        with self._lock:
+            if self.max_calls is not None and self.used >= self.max_calls:
+                raise BudgetExhausted(f"SerpApi budget of {self.max_calls} calls used up")
+            self.used += 1
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.min_interval_s
+        if wait > 0:
+            time.sleep(wait)
+
+
+API_BUDGET = ApiBudget.from_env()
@@ -0,0 +1,139 @@
+"""
+dataset_service.py
+----------------------------------
+Long-lived, in-process lookup service over <city>_restaurants_enriched_features
+(city selected with the CITY env var, default christchurch).
+
+- The enriched Parquet is converted once to an uncompressed Arrow IPC file
+  (<name>.arrow, rebuilt whenever the Parquet is newer) and memory-mapped,
+  so startup is near-instant and pages are shared between processes
+- A dict index maps restaurant_id -> row for O(1) batch lookups
+- A watcher thread swaps in a new pipeline output atomically: readers keep
+  using the snapshot they grabbed and never block on a reload
+
+Usage:
+    service = DatasetService()
+    service.start_watching()
+    rows = service.lookup(["1851-social-bar-and-lounge-chijv7jvrzukmw0rtbm4qxt2f7q"])
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cities import current_city
+
+FEATURES_PARQUET = Path(current_city().features_parquet)
+ID_COLUMN = "restaurant_id"
+POLL_INTERVAL_S = 5.0
+
+
+def _file_version(path: Path) -> tuple:
+    st = path.stat()
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _ensure_ipc_cache(parquet_path: Path) -> Path:
+    """Write <name>.arrow next to the Parquet if missing or stale; return its path."""
+    ipc_path = parquet_path.with_suffix(".arrow")
+    if ipc_path.exists() and ipc_path.stat().st_mtime_ns >= parquet_path.stat().st_mtime_ns:
+        return ipc_path
+
+    table = pq.read_table(parquet_path)
+    # Drop the pandas RangeIndex column if the Parquet was written with one.
+    table = table.drop_columns([c for c in table.column_names if c.startswith("__index_level_")])
+
+    tmp_path = ipc_path.with_name(f"{ipc_path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, ipc_path)
+    return ipc_path
+
+
+class RestaurantDataset:
+    """One immutable, memory-mapped version of the dataset plus its id index."""
+
+    def __init__(self, parquet_path: Path):
+        self.parquet_path = Path(parquet_path)
+        self.version = _file_version(self.parquet_path)
+
+        ipc_path = _ensure_ipc_cache(self.parquet_path)
+        self.table = pa.ipc.open_file(pa.memory_map(str(ipc_path), "r")).read_all()
+
+        ids = self.table.column(ID_COLUMN).to_pylist()
+        self.index: Dict[str, int] = {rid: i for i, rid in enumerate(ids)}
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def lookup(self, restaurant_ids: Sequence[str]) -> List[Optional[Dict]]:
+        """Rows (restaurant fields + nested reviews) in request order; None if unknown."""
+        positions = [self.index.get(rid) for rid in restaurant_ids]
+        found = [p for p in positions if p is not None]
+        if not found:
+            return [None] * len(positions)
+
+        rows = iter(self.table.take(found).to_pylist())
+        return [next(rows) if p is not None else None for p in positions]
+
+
+class DatasetService:
+    """
+    Holds the current RestaurantDataset. Readers take a plain reference (atomic
+    under the GIL); reloads build the new version on the side and then swap it.
+    """
+
+    def __init__(self, parquet_path: Path = FEATURES_PARQUET):
+        self.parquet_path = Path(parquet_path)
+        self._current = RestaurantDataset(self.parquet_path)
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+    @property
+    def dataset(self) -> RestaurantDataset:
+        return self._current
+
+    def lookup(self, restaurant_ids: Sequence[str]) -> List[Optional[Dict]]:
+        return self._current.lookup(restaurant_ids)
+
+    def get(self, restaurant_id: str) -> Optional[Dict]:
+        return self._current.lookup([restaurant_id])[0]
+
+    def reload_if_changed(self) -> bool:
+        """Swap in a new version if the Parquet on disk changed. Returns True if swapped."""
+        with self._reload_lock:
+            try:
+                if _file_version(self.parquet_path) == self._current.version:
+                    return False
+                fresh = RestaurantDataset(self.parquet_path)
+            except (FileNotFoundError, pa.ArrowInvalid) as e:
+                # Mid-write or missing file: keep serving the current version.
+                print(f"Dataset reload skipped: {e}")
+                return False
+            self._current = fresh
+            print(f"Dataset reloaded: {len(fresh)} restaurants from {self.parquet_path}")
+            return True
+
+    def start_watching(self, interval: float = POLL_INTERVAL_S) -> None:
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._stop.clear()
+
+        def _watch():
+            while not self._stop.wait(interval):
+                self.reload_if_changed()
+
+        self._watcher = threading.Thread(target=_watch, name="dataset-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+        if self._watcher:
+            self._watcher.join()
+            self._watcher = None
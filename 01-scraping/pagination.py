@@ -0,0 +1,92 @@
+"""
+pagination.py
+----------------------------------
+Speculative offset pagination shared by the SerpApi scrapers.
+
+- paginate() yields pages in offset order while the following offsets are
+  already in flight on a small thread pool
+- The prefetch window starts at one page and doubles after every full page
+  (up to 1 + prefetch), so single-page results cost no extra API calls while
+  deep paginations run `prefetch` pages ahead
+- A short page, or `max_empty` empty pages in a row, ends the stream: queued
+  requests are cancelled and requests still waiting for their launch slot
+  never go out (requests already sent are left to finish and discarded)
+- Launches within one stream stay at least `delay` seconds apart
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterator, List, Optional, Tuple
+
+PREFETCH = 3     # speculative pages in flight beyond the one being consumed
+
+FetchPage = Callable[[int], Optional[List]]
+
+
+def paginate(
+    fetch_page: FetchPage,
+    step: int,
+    page_size: Optional[int] = None,
+    max_empty: int = 1,
+    prefetch: int = PREFETCH,
+    delay: float = 0.0,
+    start: int = 0,
+) -> Iterator[Tuple[int, List]]:
+    """
+    Yield (offset, items) for offsets start, start + step, ... in order.
+
+    fetch_page(offset) returns that page's items (empty past the end). Exceptions
+    from a page are raised when that page is reached; failures of speculative
+    pages past the end are ignored. page_size=None disables the short-page rule.
+    """
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=prefetch + 1, thread_name_prefix="paginate")
+    in_flight: Deque[Tuple[int, Future]] = deque()
+    next_offset = start
+    next_slot = time.monotonic()
+    window = 1
+
+    def _fetch(offset: int, not_before: float) -> Optional[List]:
+        wait = not_before - time.monotonic()
+        if (wait > 0 and stop.wait(wait)) or stop.is_set():
+            return None     # stream ended before this request went out
+        return fetch_page(offset)
+
+    def _fill() -> None:
+        nonlocal next_offset, next_slot
+        while len(in_flight) < window:
+            not_before = max(time.monotonic(), next_slot)
+            next_slot = not_before + delay
+            in_flight.append((next_offset, pool.submit(_fetch, next_offset, not_before)))
+            next_offset += step
+
+    empty_run = 0
+    try:
+        _fill()
+        while in_flight:
+            offset, fut = in_flight.popleft()
+            items = fut.result() or []
+
+            if not items:
+                empty_run += 1
+                if empty_run >= max_empty:
+                    return
+                window = 1      # probably near the end: confirm serially
+                _fill()
+                continue
+
+            empty_run = 0
+            last = page_size is not None and len(items) < page_size
+            if not last:
+                window = min(window * 2, prefetch + 1)
+                _fill()
+            yield offset, items
+            if last:
+                return
+    finally:
+        stop.set()
+        for _, fut in in_flight:
+            fut.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
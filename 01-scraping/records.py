@@ -0,0 +1,178 @@
+"""
+records.py
+----------------------------------
+Compact, slotted record types shared by the scrapers.
+
+SerpApi payloads are decoded straight into these records (no intermediate
+per-row dict), kept in plain lists while scraping, and converted to Arrow
+column-by-column in fixed-size batches before hitting pandas / Parquet.
+"""
+
+from dataclasses import dataclass, fields
+from typing import ClassVar, Dict, Iterable, Iterator, List, Optional, Type, TypeVar
+
+import pyarrow as pa
+
+R = TypeVar("R")
+
+ARROW_BATCH_SIZE = 50_000
+_EMPTY: Dict = {}
+
+
+def _safe_int(n) -> Optional[int]:
+    if n is None or type(n) is int:
+        return n
+    try:
+        return int(str(n).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
+class YelpReview:
+    """One flattened Yelp review (engine=yelp_reviews)."""
+
+    place_id: str
+    review_type: Optional[str]
+    user: Optional[str]
+    rating: Optional[int]
+    date: Optional[str]
+    text: str
+    review_position: Optional[int]
+    user_address: Optional[str]
+    useful: Optional[int]
+    cool: Optional[int]
+    funny: Optional[int]
+    user_link: Optional[str]
+
+    ARROW_SCHEMA: ClassVar[pa.Schema] = pa.schema([
+        ("place_id", pa.string()),
+        ("review_type", pa.string()),
+        ("user", pa.string()),
+        ("rating", pa.int64()),
+        ("date", pa.string()),
+        ("text", pa.string()),
+        ("review_position", pa.int64()),
+        ("user_address", pa.string()),
+        ("useful", pa.int64()),
+        ("cool", pa.int64()),
+        ("funny", pa.int64()),
+        ("user_link", pa.string()),
+    ])
+
+    @classmethod
+    def from_serpapi(cls, place_id: str, r: Dict, review_type: Optional[str] = None) -> "YelpReview":
+        # Positional construction: this runs once per review, so skip kwargs.
+        user = r.get("user") or _EMPTY
+        feedback = r.get("feedback") or _EMPTY
+        return cls(
+            place_id,
+            review_type or r.get("review_type"),
+            user.get("name"),
+            _safe_int(r.get("rating")),
+            r.get("date"),
+            (r.get("comment") or _EMPTY).get("text", ""),
+            _safe_int(r.get("position")),
+            user.get("address"),
+            _safe_int(feedback.get("useful")),
+            _safe_int(feedback.get("cool")),
+            _safe_int(feedback.get("funny")),
+            user.get("link"),
+        )
+
+
+@dataclass(slots=True)
+class GooglePlace:
+    """One normalised Google Maps search result (engine=google_maps)."""
+
+    place_id: Optional[str]
+    data_id: Optional[str]
+    title: Optional[str]
+    address: Optional[str]
+    lat: Optional[float]
+    lon: Optional[float]
+    type: Optional[str]
+    rating: Optional[float]
+    reviews_count: Optional[int]
+    url: Optional[str]
+    search_query: str
+    start_offset: int
+    serpapi_search_id: Optional[str]
+
+    ARROW_SCHEMA: ClassVar[pa.Schema] = pa.schema([
+        ("place_id", pa.string()),
+        ("data_id", pa.string()),
+        ("title", pa.string()),
+        ("address", pa.string()),
+        ("lat", pa.float64()),
+        ("lon", pa.float64()),
+        ("type", pa.string()),
+        ("rating", pa.float64()),
+        ("reviews_count", pa.int64()),
+        ("url", pa.string()),
+        ("search_query", pa.string()),
+        ("start_offset", pa.int64()),
+        ("serpapi_search_id", pa.string()),
+    ])
+
+    @classmethod
+    def from_serpapi(cls, item: Dict, query: str, start: int, search_id: Optional[str]) -> "GooglePlace":
+        gps = item.get("gps_coordinates") or {}
+        itype = item.get("type") or item.get("category")
+        if isinstance(itype, list):
+            itype = ", ".join(itype)
+        rating = item.get("rating")
+
+        # Positional construction, in field order (see YelpReview.from_serpapi).
+        return cls(
+            item.get("place_id"),
+            item.get("data_id"),
+            item.get("title"),
+            item.get("address"),
+            gps.get("latitude"),
+            gps.get("longitude"),
+            itype,
+            float(rating) if rating is not None else None,
+            _safe_int(item.get("reviews_count", item.get("reviews"))),
+            item.get("link") or item.get("place_link"),
+            query,
+            start,
+            search_id,
+        )
+
+
+def field_names(cls: Type) -> List[str]:
+    return [f.name for f in fields(cls)]
+
+
+def iter_record_batches(records: Iterable, cls: Type, batch_size: int = ARROW_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """Transpose records into Arrow columns, batch_size rows at a time."""
+    names = field_names(cls)
+    schema = cls.ARROW_SCHEMA
+    batch: List = []
+
+    def _flush() -> pa.RecordBatch:
+        columns = [
+            pa.array([getattr(rec, name) for rec in batch], type=schema.field(name).type)
+            for name in names
+        ]
+        return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    for rec in records:
+        batch.append(rec)
+        if len(batch) >= batch_size:
+            yield _flush()
+            batch = []
+    if batch:
+        yield _flush()
+
+
+def records_to_table(records: Iterable, cls: Type, batch_size: int = ARROW_BATCH_SIZE) -> pa.Table:
+    return pa.Table.from_batches(list(iter_record_batches(records, cls, batch_size)), schema=cls.ARROW_SCHEMA)
+
+
+def records_from_table(table: pa.Table, cls: Type[R]) -> List[R]:
+    """Rebuild records from an Arrow table (e.g. a Parquet checkpoint)."""
+    names = field_names(cls)
+    columns = [table.column(name).to_pylist() for name in names]
+    return [cls(*values) for values in zip(*columns)]
@@ -0,0 +1,141 @@
+"""
+snapshots.py
+----------------------------------
+Discovery snapshot archive + change-data-capture helpers.
+
+- archive_snapshot(): copy a discovery output into a timestamped snapshot folder
+- diff_snapshots(): new / closed places, reviews_count deltas, rating shifts
+- build_rescrape_list(): prioritised place_ids whose reviews actually changed
+- load_rescrape_list(): read the list back inside the review scrapers
+"""
+
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from cities import City
+
+# Snapshots and re-scrape lists are kept per city: <dir>/<city slug>/
+YELP_SNAPSHOT_DIR = Path("data/yelp-data/snapshots")
+GOOGLE_SNAPSHOT_DIR = Path("data/google-data/google-restaurants-place/snapshots")
+SNAPSHOT_DIRS = {"yelp": YELP_SNAPSHOT_DIR, "google": GOOGLE_SNAPSHOT_DIR}
+RESCRAPE_DIR = Path("data/rescrape")
+
+# Discovery outputs name the same fields differently per source.
+SOURCE_COLUMNS = {
+    "yelp": {"place_id": "place_id", "title": "title", "rating": "rating", "reviews": "reviews_count"},
+    "google": {"place_id": "place_id", "title": "title", "rating": "rating", "reviews_count": "reviews_count"},
+}
+
+MIN_REVIEW_DELTA = 1      # re-scrape places that gained at least this many reviews
+RATING_SHIFT = 0.1        # flag rating moves at least this large (reviews edited / removed)
+
+
+def snapshot_dir(source: str, city: City) -> Path:
+    return SNAPSHOT_DIRS[source] / city.slug
+
+
+def archive_snapshot(path, source: str, city: City) -> Path:
+    """Copy a discovery output to <snapshot dir>/<city>/<stem>_<UTC timestamp><suffix>."""
+    src = Path(path)
+    out_dir = snapshot_dir(source, city)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    dst = out_dir / f"{src.stem}_{stamp}{src.suffix}"
+    shutil.copy2(src, dst)
+    return dst
+
+
+def latest_snapshots(snapshot_dir, n: int = 2) -> List[Path]:
+    """Newest-last list of the n most recent snapshots (timestamps sort lexically)."""
+    files = sorted(p for p in Path(snapshot_dir).glob("*_*Z.*") if p.suffix in (".csv", ".parquet", ".json"))
+    return files[-n:]
+
+
+def load_snapshot(path, source: str) -> pd.DataFrame:
+    path = Path(path)
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    elif path.suffix == ".json":
+        df = pd.read_json(path)
+    else:
+        df = pd.read_csv(path)
+
+    columns = SOURCE_COLUMNS[source]
+    df = df[[c for c in columns if c in df.columns]].rename(columns=columns)
+    df["reviews_count"] = pd.to_numeric(df["reviews_count"], errors="coerce")
+    df["rating"] = pd.to_numeric(df["rating"], errors="coerce")
+    df = df.dropna(subset=["place_id"])
+    # Keep the busiest row when a place surfaced under several queries.
+    df = df.sort_values("reviews_count", ascending=False).drop_duplicates("place_id")
+    return df.set_index("place_id")
+
+
+def diff_snapshots(prev: pd.DataFrame, curr: pd.DataFrame) -> pd.DataFrame:
+    """
+    Outer-join two snapshots on place_id and classify each place as
+    new / closed / changed / unchanged.
+    """
+    joined = prev.join(curr, how="outer", lsuffix="_prev", rsuffix="_curr")
+    in_prev = joined.index.isin(prev.index)
+    in_curr = joined.index.isin(curr.index)
+
+    diff = pd.DataFrame(index=joined.index)
+    diff["title"] = joined["title_curr"].fillna(joined["title_prev"])
+    diff["reviews_count_prev"] = joined["reviews_count_prev"]
+    diff["reviews_count"] = joined["reviews_count_curr"]
+    diff["reviews_delta"] = (joined["reviews_count_curr"] - joined["reviews_count_prev"]).fillna(0)
+    diff["rating_prev"] = joined["rating_prev"]
+    diff["rating"] = joined["rating_curr"]
+    diff["rating_delta"] = (joined["rating_curr"] - joined["rating_prev"]).fillna(0).round(2)
+
+    changed = (diff["reviews_delta"] >= MIN_REVIEW_DELTA) | (diff["rating_delta"].abs() >= RATING_SHIFT)
+    diff["change_type"] = "unchanged"
+    diff.loc[in_prev & in_curr & changed, "change_type"] = "changed"
+    diff.loc[~in_prev & in_curr, "change_type"] = "new"
+    diff.loc[in_prev & ~in_curr, "change_type"] = "closed"
+    return diff.reset_index()
+
+
+def build_rescrape_list(diff: pd.DataFrame, snapshot: str) -> pd.DataFrame:
+    """
+    New places first (all their reviews are unseen), then changed places by
+    reviews gained, with rating shift as tie-breaker.
+    """
+    todo = diff[diff["change_type"].isin(["new", "changed"])].copy()
+    todo["reviews_to_fetch"] = todo["reviews_delta"].where(todo["change_type"] == "changed", todo["reviews_count"])
+    todo["is_new"] = todo["change_type"] == "new"
+    todo["abs_rating_delta"] = todo["rating_delta"].abs()
+    todo = todo.sort_values(["is_new", "reviews_to_fetch", "abs_rating_delta"], ascending=False)
+    todo["priority"] = range(1, len(todo) + 1)
+    todo["snapshot"] = snapshot
+    return todo[["priority", "place_id", "title", "change_type", "reviews_to_fetch",
+                 "reviews_delta", "rating_delta", "snapshot"]]
+
+
+def rescrape_paths(source: str, city: City) -> Tuple[Path, Path]:
+    out_dir = RESCRAPE_DIR / city.slug
+    return out_dir / f"{source}_snapshot_diff.csv", out_dir / f"{source}_rescrape_list.csv"
+
+
+def load_rescrape_list(source: str, city: City) -> Optional[Tuple[List[str], str]]:
+    """
+    Return (place_ids in priority order, snapshot name), or None if no list
+    exists or it predates the latest discovery snapshot (a newer discovery
+    run means a full scrape until 08 is rerun).
+    """
+    _, list_path = rescrape_paths(source, city)
+    if not list_path.exists():
+        return None
+
+    latest = latest_snapshots(snapshot_dir(source, city), n=1)
+    if latest and latest[-1].stat().st_mtime > list_path.stat().st_mtime:
+        print(f"Ignoring stale re-scrape list {list_path} (older than {latest[-1].name}).")
+        return None
+
+    df = pd.read_csv(list_path).sort_values("priority")
+    snapshot = str(df["snapshot"].iloc[0]) if not df.empty else "empty"
+    return df["place_id"].dropna().tolist(), snapshot